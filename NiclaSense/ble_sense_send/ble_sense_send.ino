@@ -27,12 +27,19 @@
 
 BLEService service("FFE0");
 
-BLEFloatCharacteristic temperatureCharacteristic("2A1C", BLERead);
-BLEUnsignedIntCharacteristic humidityCharacteristic("2A6F", BLERead);
-BLEFloatCharacteristic pressureCharacteristic("2AA3", BLERead);
-BLEFloatCharacteristic bsecCharacteristic("2BCF", BLERead);
-BLEIntCharacteristic  co2Characteristic("2BD0", BLERead);
-BLEUnsignedIntCharacteristic gasCharacteristic("27AD", BLERead);
+BLEFloatCharacteristic temperatureCharacteristic("2A1C", BLERead | BLENotify);
+BLEUnsignedIntCharacteristic humidityCharacteristic("2A6F", BLERead | BLENotify);
+BLEFloatCharacteristic pressureCharacteristic("2AA3", BLERead | BLENotify);
+BLEFloatCharacteristic bsecCharacteristic("2BCF", BLERead | BLENotify);
+BLEIntCharacteristic  co2Characteristic("2BD0", BLERead | BLENotify);
+BLEUnsignedIntCharacteristic gasCharacteristic("27AD", BLERead | BLENotify);
+
+// How often the sensor values are checked for changes, and how often they are
+// notified even when unchanged so that subscribers still see the device is alive
+const unsigned long UPDATE_INTERVAL_MS = 1000;
+const unsigned long HEARTBEAT_INTERVAL_MS = 60000;
+unsigned long lastUpdate = 0;
+unsigned long lastHeartbeat = 0;
 
 // String to calculate the local and device name
 String name;
@@ -113,8 +120,50 @@ void setup() {
 void loop() {
   BLE.poll();
   BHY2.update();
+
+  unsigned long now = millis();
+  if (now - lastUpdate >= UPDATE_INTERVAL_MS) {
+    lastUpdate = now;
+    bool heartbeat = now - lastHeartbeat >= HEARTBEAT_INTERVAL_MS;
+    if (heartbeat) {
+      lastHeartbeat = now;
+    }
+    updateCharacteristics(heartbeat);
+  }
+}
+
+// writeValue() notifies the subscribed centrals, so only values that changed are
+// written, except on a heartbeat
+void updateCharacteristics(bool force) {
   float temperatureValue = temperature.value();
-  temperatureCharacteristic.writeValue(temperatureValue);
+  if (force || temperatureCharacteristic.value() != temperatureValue) {
+    temperatureCharacteristic.writeValue(temperatureValue);
+  }
+
+  unsigned int humidityValue = (uint8_t)humidity.value();
+  if (force || humidityCharacteristic.value() != humidityValue) {
+    humidityCharacteristic.writeValue(humidityValue);
+  }
+
+  float pressureValue = pressure.value();
+  if (force || pressureCharacteristic.value() != pressureValue) {
+    pressureCharacteristic.writeValue(pressureValue);
+  }
+
+  float airQuality = float(bsec.iaq());
+  if (force || bsecCharacteristic.value() != airQuality) {
+    bsecCharacteristic.writeValue(airQuality);
+  }
+
+  int co2 = bsec.co2_eq();
+  if (force || co2Characteristic.value() != co2) {
+    co2Characteristic.writeValue(co2);
+  }
+
+  unsigned int g = gas.value();
+  if (force || gasCharacteristic.value() != g) {
+    gasCharacteristic.writeValue(g);
+  }
 }
 
 void blePeripheralDisconnectHandler(BLEDevice central) {
@@ -1,6 +1,6 @@
 from micropython import const
 from .device import Device, DeviceDisconnectedError
-from .core import log_info, log_warn, log_error, GattError, config, stop
+from .core import log_info, log_warn, log_error, GattError, config, stop, irq_stats
 try:
 	from .peripheral import advertise
 except:
@@ -21,6 +21,7 @@ _ADV_SCAN_IND = const(2)
 _ADV_NONCONN_IND = const(3)
 _SCAN_RSP = const(4)
 _ADV_TYPE_FLAGS = const(0x01)
+_ADV_TYPE_SHORT_NAME = const(0x08)
 _ADV_TYPE_NAME = const(0x09)
 _ADV_TYPE_UUID16_INCOMPLETE = const(0x2)
 _ADV_TYPE_UUID16_COMPLETE = const(0x3)
@@ -30,37 +31,51 @@ _ADV_TYPE_UUID128_INCOMPLETE = const(0x6)
 _ADV_TYPE_UUID128_COMPLETE = const(0x7)
 _ADV_TYPE_APPEARANCE = const(0x19)
 _ADV_TYPE_MANUFACTURER = const(0xFF)
+_SCAN_ADV_MAX = const(31)
+_SCAN_SLOT = const(41)
 _active_scanner = None
 _connecting = set()
-def _central_irq(event, data):
-	if event == _IRQ_SCAN_RESULT:
-		addr_type, addr, adv_type, rssi, adv_data = data
-		if not _active_scanner:
-			return
-		_active_scanner._queue.append((addr_type, bytes(addr), adv_type, rssi, bytes(adv_data)))
-		_active_scanner._event.set()
-	elif event == _IRQ_SCAN_DONE:
-		if not _active_scanner:
-			return
-		_active_scanner._done = True
+def _match(data, offset, value):
+	for j in range(len(value)):
+		if data[offset + j] != value[j]:
+			return False
+	return True
+def _irq_scan_result(data):
+	addr_type, addr, adv_type, rssi, adv_data = data
+	if not _active_scanner:
+		return
+	if _active_scanner._admit(addr_type, addr, adv_type, rssi, adv_data) and _active_scanner._push(addr_type, addr, adv_type, rssi, adv_data):
 		_active_scanner._event.set()
-	elif event == _IRQ_PERIPHERAL_CONNECT:
-		conn_handle, addr_type, addr = data
-		for d in _connecting:
-			if d.addr_type == addr_type and d.addr == addr:
-				connection = d._connection
-				connection._conn_handle = conn_handle
-				connection._event.set()
-				break
-	elif event == _IRQ_PERIPHERAL_DISCONNECT:
-		conn_handle, _, _ = data
-		if connection := DeviceConnection._connected.get(conn_handle, None):
+def _irq_scan_done(data):
+	if not _active_scanner:
+		return
+	_active_scanner._done = True
+	_active_scanner._event.set()
+def _irq_peripheral_connect(data):
+	conn_handle, addr_type, addr = data
+	for d in _connecting:
+		if d.addr_type == addr_type and d.addr == addr:
+			connection = d._connection
+			connection._conn_handle = conn_handle
 			connection._event.set()
+			break
+def _irq_peripheral_disconnect(data):
+	conn_handle, _, _ = data
+	if connection := DeviceConnection._connected.get(conn_handle, None):
+		connection._event.set()
 def _central_shutdown():
 	global _active_scanner, _connecting
 	_active_scanner = None
 	_connecting = set()
-register_irq_handler(_central_irq, _central_shutdown)
+register_irq_handler(
+	{
+		_IRQ_SCAN_RESULT: _irq_scan_result,
+		_IRQ_SCAN_DONE: _irq_scan_done,
+		_IRQ_PERIPHERAL_CONNECT: _irq_peripheral_connect,
+		_IRQ_PERIPHERAL_DISCONNECT: _irq_peripheral_disconnect,
+	},
+	_central_shutdown,
+)
 async def _cancel_pending():
 	if _active_scanner:
 		await _active_scanner.cancel()
@@ -87,6 +102,8 @@ class ScanResult:
 		self.resp_data = None
 		self.rssi = None
 		self.connectable = False
+		self._seen = 0
+		self._index = None
 	def _update(self, adv_type, rssi, adv_data):
 		updated = False
 		if rssi != self.rssi:
@@ -96,50 +113,101 @@ class ScanResult:
 			if adv_data != self.adv_data:
 				self.adv_data = adv_data
 				self.connectable = adv_type == _ADV_IND
+				self._index = None
 				updated = True
 		elif adv_type == _ADV_SCAN_IND:
-			if adv_data != self.adv_data and self.resp_data:
-				updated = True
+			if adv_data != self.adv_data:
+				if self.resp_data:
+					updated = True
+				self._index = None
 			self.adv_data = adv_data
 		elif adv_type == _SCAN_RSP and adv_data:
 			if adv_data != self.resp_data:
 				self.resp_data = adv_data
+				self._index = None
 				updated = True
 		return updated
 	def __str__(self):
 		return "Scan result: {} {}".format(self.device, self.rssi)
-	def _decode_field(self, *adv_type):
+	def _parse(self):
+		self._index = {}
 		for payload in (self.adv_data, self.resp_data):
 			if not payload:
 				continue
+			payload = memoryview(payload)
+			n = len(payload)
 			i = 0
-			while i + 1 < len(payload):
-				if payload[i + 1] in adv_type:
-					yield payload[i + 2 : i + payload[i] + 1]
+			while i + 1 < n:
+				field = payload[i + 2 : min(i + payload[i] + 1, n)]
+				if (fields := self._index.get(payload[i + 1], None)) is None:
+					self._index[payload[i + 1]] = [field]
+				else:
+					fields.append(field)
 				i += 1 + payload[i]
+	def _decode_field(self, *adv_type):
+		if self._index is None:
+			self._parse()
+		for t in adv_type:
+			if fields := self._index.get(t, None):
+				yield from fields
 	def name(self):
 		for n in self._decode_field(_ADV_TYPE_NAME):
 			return str(n, "utf-8") if n else ""
 	def services(self):
 		for u in self._decode_field(_ADV_TYPE_UUID16_INCOMPLETE, _ADV_TYPE_UUID16_COMPLETE):
-			yield bluetooth.UUID(struct.unpack("<H", u)[0])
+			for i in range(0, len(u) - 1, 2):
+				yield bluetooth.UUID(u[i] | u[i + 1] << 8)
 		for u in self._decode_field(_ADV_TYPE_UUID32_INCOMPLETE, _ADV_TYPE_UUID32_COMPLETE):
-			yield bluetooth.UUID(struct.unpack("<I", u)[0])
+			for i in range(0, len(u) - 3, 4):
+				yield bluetooth.UUID(struct.unpack_from("<I", u, i)[0])
 		for u in self._decode_field(_ADV_TYPE_UUID128_INCOMPLETE, _ADV_TYPE_UUID128_COMPLETE):
-			yield bluetooth.UUID(u)
+			for i in range(0, len(u) - 15, 16):
+				yield bluetooth.UUID(u[i : i + 16])
 	def manufacturer(self, filter=None):
 		for u in self._decode_field(_ADV_TYPE_MANUFACTURER):
 			if len(u) < 2:
 				continue
-			m = struct.unpack("<H", u[0:2])[0]
+			m = u[0] | u[1] << 8
 			if filter is None or m == filter:
-				yield (m, u[2:])
+				yield (m, bytes(u[2:]))
 class scan:
-	def __init__(self, duration_ms, interval_us=None, window_us=None, active=False):
-		self._queue = []
+	def __init__(
+		self,
+		duration_ms,
+		interval_us=None,
+		window_us=None,
+		active=False,
+		max_results=None,
+		queue_size=32,
+		services=None,
+		name=None,
+		manufacturer=None,
+		min_rssi=None,
+		addresses=None,
+	):
+		self._queue = bytearray(queue_size * _SCAN_SLOT)
+		self._queue_size = queue_size
+		self._head = 0
+		self._tail = 0
+		self._writes = 0
+		self.dropped = 0
+		self.coalesced = 0
+		self._services = [bytes(u if isinstance(u, bluetooth.UUID) else bluetooth.UUID(u)) for u in services] if services else None
+		self._name = name.encode() if name else None
+		self._manufacturer = (manufacturer,) if isinstance(manufacturer, int) else tuple(manufacturer) if manufacturer else None
+		self._min_rssi = min_rssi
+		self._addresses = [a.addr if isinstance(a, Device) else Device(0, a).addr for a in addresses] if addresses else None
+		self._accepted = bytearray(7)
+		self._has_accepted = False
+		self._pending = bytearray(_SCAN_SLOT)
+		self._pending_addr = memoryview(self._pending)[1:7]
+		self._pending_data = memoryview(self._pending)[10:]
+		self._has_pending = False
 		self._event = asyncio.ThreadSafeFlag()
 		self._done = False
-		self._results = set()
+		self._results = {}
+		self._max_results = max_results
+		self._seen = 0
 		self._duration_ms = duration_ms
 		self._interval_us = interval_us or 1280000
 		self._window_us = window_us or 11250
@@ -162,22 +230,129 @@ class scan:
 		if _active_scanner != self:
 			raise StopAsyncIteration
 		while True:
-			while self._queue:
-				addr_type, addr, adv_type, rssi, adv_data = self._queue.pop()
-				for r in self._results:
-					if r.device.addr_type == addr_type and r.device.addr == addr:
-						result = r
-						break
-				else:
-					device = Device(addr_type, addr)
-					result = ScanResult(device)
-					self._results.add(result)
+			while self._head != self._tail:
+				q = self._queue
+				o = self._head % self._queue_size * _SCAN_SLOT
+				writes = self._writes
+				addr_type = q[o]
+				addr = bytes(q[o + 1 : o + 7])
+				adv_type = q[o + 7]
+				rssi = q[o + 8] - 256 if q[o + 8] > 127 else q[o + 8]
+				adv_data = bytes(q[o + 10 : o + 10 + q[o + 9]])
+				if writes != self._writes:
+					continue
+				self._head = (self._head + 1) % (2 * self._queue_size)
+				key = (addr_type, addr)
+				if (result := self._results.get(key, None)) is None:
+					if self._max_results and len(self._results) >= self._max_results:
+						self._evict()
+					result = self._results[key] = ScanResult(Device(addr_type, addr))
+				self._seen += 1
+				result._seen = self._seen
 				if result._update(adv_type, rssi, adv_data):
 					return result
 			if self._done:
 				_active_scanner = None
 				raise StopAsyncIteration
 			await self._event.wait()
+	def _admit(self, addr_type, addr, adv_type, rssi, adv_data):
+		a = self._accepted
+		if adv_type == _SCAN_RSP and self._has_accepted and a[0] == addr_type and _match(a, 1, addr):
+			return True
+		p = self._pending
+		if not self._accept(addr, rssi, adv_data):
+			if (adv_type == _ADV_IND or adv_type == _ADV_SCAN_IND) and len(adv_data) <= _SCAN_ADV_MAX:
+				p[0] = addr_type
+				for j in range(6):
+					p[1 + j] = addr[j]
+				p[7] = adv_type
+				p[8] = rssi & 0xFF
+				p[9] = len(adv_data)
+				for j in range(len(adv_data)):
+					p[10 + j] = adv_data[j]
+				self._has_pending = True
+			return False
+		if adv_type != _SCAN_RSP:
+			a[0] = addr_type
+			for j in range(6):
+				a[1 + j] = addr[j]
+			self._has_accepted = True
+		elif self._has_pending and p[0] == addr_type and _match(p, 1, addr):
+			self._has_pending = False
+			if self._push(addr_type, self._pending_addr, p[7], p[8], self._pending_data, p[9]):
+				self._event.set()
+		return True
+	def _accept(self, addr, rssi, adv_data):
+		if self._min_rssi is not None and rssi < self._min_rssi:
+			return False
+		if self._addresses:
+			for a in self._addresses:
+				if _match(addr, 0, a):
+					break
+			else:
+				return False
+		services = self._services is None
+		name = self._name is None
+		manufacturer = self._manufacturer is None
+		i = 0
+		n = len(adv_data)
+		while not (services and name and manufacturer) and i + 1 < n:
+			t = adv_data[i + 1]
+			start = i + 2
+			i += 1 + adv_data[i]
+			if i > n:
+				break
+			if t == _ADV_TYPE_NAME or t == _ADV_TYPE_SHORT_NAME:
+				name = name or (i - start >= len(self._name) and _match(adv_data, start, self._name))
+			elif t == _ADV_TYPE_MANUFACTURER:
+				manufacturer = manufacturer or (i - start >= 2 and adv_data[start] | adv_data[start + 1] << 8 in self._manufacturer)
+			elif not services and _ADV_TYPE_UUID16_INCOMPLETE <= t <= _ADV_TYPE_UUID128_COMPLETE:
+				w = 2 if t <= _ADV_TYPE_UUID16_COMPLETE else 4 if t <= _ADV_TYPE_UUID32_COMPLETE else 16
+				for u in self._services:
+					if len(u) == w:
+						j = start
+						while j + w <= i:
+							if _match(adv_data, j, u):
+								services = True
+								break
+							j += w
+		return services and name and manufacturer
+	def _push(self, addr_type, addr, adv_type, rssi, adv_data, n=None):
+		q = self._queue
+		size = self._queue_size
+		n = len(adv_data) if n is None else n
+		if n > _SCAN_ADV_MAX:
+			self.dropped += 1
+			return False
+		i = self._head
+		while i != self._tail:
+			o = i % size * _SCAN_SLOT
+			if q[o] == addr_type and q[o + 7] == adv_type and _match(q, o + 1, addr):
+				self.coalesced += 1
+				self._writes = (self._writes + 1) & 0x3FFFFFFF
+				break
+			i = (i + 1) % (2 * size)
+		else:
+			if (i - self._head) % (2 * size) == size:
+				self.dropped += 1
+				return False
+			o = i % size * _SCAN_SLOT
+			q[o] = addr_type
+			for j in range(6):
+				q[o + 1 + j] = addr[j]
+			q[o + 7] = adv_type
+		q[o + 8] = rssi & 0xFF
+		q[o + 9] = n
+		for j in range(n):
+			q[o + 10 + j] = adv_data[j]
+		if i == self._tail:
+			self._tail = (i + 1) % (2 * size)
+		return True
+	def _evict(self):
+		keep = self._max_results * 3 // 4
+		oldest = sorted(r._seen for r in self._results.values())[-keep] if keep else self._seen + 1
+		for key in [k for k, r in self._results.items() if r._seen < oldest]:
+			del self._results[key]
 	async def cancel(self):
 		if self._done:
 			return
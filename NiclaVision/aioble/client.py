@@ -3,7 +3,9 @@ from collections import deque
 import uasyncio as asyncio
 import struct
 import bluetooth
-from .core import ble, GattError, register_irq_handler
+import binascii
+import json
+from .core import ble, GattError, register_irq_handler, log_warn
 from .device import DeviceConnection
 _IRQ_GATTC_SERVICE_RESULT = const(9)
 _IRQ_GATTC_SERVICE_DONE = const(10)
@@ -24,45 +26,131 @@ _FLAG_WRITE_NO_RESPONSE = const(0x0004)
 _FLAG_WRITE = const(0x0008)
 _FLAG_NOTIFY = const(0x0010)
 _FLAG_INDICATE = const(0x0020)
-def _client_irq(event, data):
-	if event == _IRQ_GATTC_SERVICE_RESULT:
-		conn_handle, start_handle, end_handle, uuid = data
-		ClientDiscover._discover_result(
-			conn_handle, start_handle, end_handle, bluetooth.UUID(uuid)
-		)
-	elif event == _IRQ_GATTC_SERVICE_DONE:
-		conn_handle, status = data
-		ClientDiscover._discover_done(conn_handle, status)
-	elif event == _IRQ_GATTC_CHARACTERISTIC_RESULT:
-		conn_handle, def_handle, value_handle, properties, uuid = data
-		ClientDiscover._discover_result(
-			conn_handle, def_handle, value_handle, properties, bluetooth.UUID(uuid)
-		)
-	elif event == _IRQ_GATTC_CHARACTERISTIC_DONE:
-		conn_handle, status = data
-		ClientDiscover._discover_done(conn_handle, status)
-	elif event == _IRQ_GATTC_DESCRIPTOR_RESULT:
-		conn_handle, dsc_handle, uuid = data
-		ClientDiscover._discover_result(conn_handle, dsc_handle, bluetooth.UUID(uuid))
-	elif event == _IRQ_GATTC_DESCRIPTOR_DONE:
-		conn_handle, status = data
-		ClientDiscover._discover_done(conn_handle, status)
-	elif event == _IRQ_GATTC_READ_RESULT:
-		conn_handle, value_handle, char_data = data
-		ClientCharacteristic._read_result(conn_handle, value_handle, bytes(char_data))
-	elif event == _IRQ_GATTC_READ_DONE:
-		conn_handle, value_handle, status = data
-		ClientCharacteristic._read_done(conn_handle, value_handle, status)
-	elif event == _IRQ_GATTC_WRITE_DONE:
-		conn_handle, value_handle, status = data
-		ClientCharacteristic._write_done(conn_handle, value_handle, status)
-	elif event == _IRQ_GATTC_NOTIFY:
-		conn_handle, value_handle, notify_data = data
-		ClientCharacteristic._on_notify(conn_handle, value_handle, bytes(notify_data))
-	elif event == _IRQ_GATTC_INDICATE:
-		conn_handle, value_handle, indicate_data = data
-		ClientCharacteristic._on_indicate(conn_handle, value_handle, bytes(indicate_data))
-register_irq_handler(_client_irq, None)
+OVERFLOW_DROP_OLDEST = const(0)
+OVERFLOW_DROP_NEWEST = const(1)
+_DEFAULT_CACHE_PATH = "ble_gatt_cache.json"
+_cache = {}
+_cache_modified = False
+_cache_path = None
+def load_cache(path=None):
+	global _cache_path, _cache
+	_cache_path = path or _cache_path or _DEFAULT_CACHE_PATH
+	_cache = {}
+	try:
+		with open(_cache_path, "r") as f:
+			_cache = json.load(f)
+	except:
+		log_warn("No attribute cache available")
+def _save_cache():
+	global _cache_modified
+	if not _cache_path or not _cache_modified:
+		return
+	with open(_cache_path, "w") as f:
+		json.dump(_cache, f)
+		_cache_modified = False
+def clear_cache(device=None):
+	global _cache_modified
+	if device:
+		_cache.pop(_peer_key(device), None)
+	else:
+		_cache.clear()
+	_cache_modified = True
+	_save_cache()
+def _peer_key(device):
+	return "{}/{}".format(device.addr_type, device.addr_hex())
+def _uuid_key(uuid):
+	return binascii.hexlify(bytes(uuid)).decode()
+def _cached(connection, key):
+	if _cache_path and (peer := _cache.get(_peer_key(connection.device), None)):
+		return peer.get(key, None)
+def _cache_put(connection, key, value):
+	global _cache_modified
+	if not _cache_path:
+		return
+	if (peer := _cache.get(_peer_key(connection.device), None)) is None:
+		peer = _cache[_peer_key(connection.device)] = {}
+	peer[key] = value
+	_cache_modified = True
+	connection._cache_modified = True
+def _irq_service_result(data):
+	conn_handle, start_handle, end_handle, uuid = data
+	ClientDiscover._discover_result(
+		conn_handle, start_handle, end_handle, bluetooth.UUID(uuid)
+	)
+def _irq_characteristic_result(data):
+	conn_handle, def_handle, value_handle, properties, uuid = data
+	ClientDiscover._discover_result(
+		conn_handle, def_handle, value_handle, properties, bluetooth.UUID(uuid)
+	)
+def _irq_descriptor_result(data):
+	conn_handle, dsc_handle, uuid = data
+	ClientDiscover._discover_result(conn_handle, dsc_handle, bluetooth.UUID(uuid))
+def _irq_discover_done(data):
+	conn_handle, status = data
+	ClientDiscover._discover_done(conn_handle, status)
+def _irq_read_result(data):
+	conn_handle, value_handle, char_data = data
+	ClientCharacteristic._read_result(conn_handle, value_handle, bytes(char_data))
+def _irq_read_done(data):
+	conn_handle, value_handle, status = data
+	ClientCharacteristic._read_done(conn_handle, value_handle, status)
+def _irq_write_done(data):
+	conn_handle, value_handle, status = data
+	ClientCharacteristic._write_done(conn_handle, value_handle, status)
+def _irq_notify(data):
+	conn_handle, value_handle, notify_data = data
+	ClientCharacteristic._on_notify(conn_handle, value_handle, bytes(notify_data))
+def _irq_indicate(data):
+	conn_handle, value_handle, indicate_data = data
+	ClientCharacteristic._on_indicate(conn_handle, value_handle, bytes(indicate_data))
+register_irq_handler(
+	{
+		_IRQ_GATTC_SERVICE_RESULT: _irq_service_result,
+		_IRQ_GATTC_SERVICE_DONE: _irq_discover_done,
+		_IRQ_GATTC_CHARACTERISTIC_RESULT: _irq_characteristic_result,
+		_IRQ_GATTC_CHARACTERISTIC_DONE: _irq_discover_done,
+		_IRQ_GATTC_DESCRIPTOR_RESULT: _irq_descriptor_result,
+		_IRQ_GATTC_DESCRIPTOR_DONE: _irq_discover_done,
+		_IRQ_GATTC_READ_RESULT: _irq_read_result,
+		_IRQ_GATTC_READ_DONE: _irq_read_done,
+		_IRQ_GATTC_WRITE_DONE: _irq_write_done,
+		_IRQ_GATTC_NOTIFY: _irq_notify,
+		_IRQ_GATTC_INDICATE: _irq_indicate,
+	},
+	None,
+)
+async def read_many(connection, characteristics, timeout_ms=2000):
+	characteristics = list(characteristics)
+	event = asyncio.ThreadSafeFlag()
+	handles = set()
+	for c in characteristics:
+		c._check(_FLAG_READ)
+		if c._value_handle in handles:
+			raise ValueError("Characteristic read twice")
+		handles.add(c._value_handle)
+		c._register_with_connection()
+		c._read_status = None
+		c._read_event = event
+	try:
+		with connection.timeout(timeout_ms):
+			for n, c in enumerate(characteristics):
+				while True:
+					try:
+						ble.gattc_read(connection._conn_handle, c._value_handle)
+						break
+					except OSError:
+						if all(p._read_status is not None for p in characteristics[:n]):
+							raise
+						await event.wait()
+			while any(c._read_status is None for c in characteristics):
+				await event.wait()
+	finally:
+		for c in characteristics:
+			c._read_event = None
+	for c in characteristics:
+		if c._read_status != 0:
+			raise GattError(c._read_status)
+	return [c._read_data for c in characteristics]
 class ClientDiscover:
 	def __init__(self, connection, disc_type, parent, timeout_ms, *args):
 		self._connection = connection
@@ -109,15 +197,25 @@ class ClientService:
 	def __str__(self):
 		return "Service: {} {} {}".format(self._start_handle, self._end_handle, self.uuid)
 	async def characteristic(self, uuid, timeout_ms=2000):
+		key = "c{}/{}".format(self._start_handle, _uuid_key(uuid))
+		if cached := _cached(self.connection, key):
+			return ClientCharacteristic(self, cached[0], cached[1], cached[2], uuid)
 		result = None
 		async for characteristic in self.characteristics(uuid, timeout_ms):
 			if not result and characteristic.uuid == uuid:
 				result = characteristic
+		if result:
+			_cache_put(self.connection, key, [result._def_handle, result._value_handle, result.properties])
 		return result
 	def characteristics(self, uuid=None, timeout_ms=2000):
 		return ClientDiscover(self.connection, ClientCharacteristic, self, timeout_ms, uuid)
 	def _start_discovery(connection, uuid=None):
 		ble.gattc_discover_services(connection._conn_handle, uuid)
+	def _from_cache(connection, uuid):
+		if cached := _cached(connection, "s" + _uuid_key(uuid)):
+			return ClientService(connection, cached[0], cached[1], uuid)
+	def _cache(self):
+		_cache_put(self.connection, "s" + _uuid_key(self.uuid), [self._start_handle, self._end_handle])
 class BaseClientCharacteristic:
 	def _register_with_connection(self):
 		self._connection()._characteristics[self._value_handle] = self
@@ -145,11 +243,13 @@ class BaseClientCharacteristic:
 	def _read_result(conn_handle, value_handle, data):
 		if characteristic := ClientCharacteristic._find(conn_handle, value_handle):
 			characteristic._read_data = data
-			characteristic._read_event.set()
+			if event := characteristic._read_event:
+				event.set()
 	def _read_done(conn_handle, value_handle, status):
 		if characteristic := ClientCharacteristic._find(conn_handle, value_handle):
 			characteristic._read_status = status
-			characteristic._read_event.set()
+			if event := characteristic._read_event:
+				event.set()
 	async def write(self, data, response=False, timeout_ms=1000):
 		self._check(_FLAG_WRITE | _FLAG_WRITE_NO_RESPONSE)
 		if (
@@ -180,6 +280,9 @@ class ClientCharacteristic(BaseClientCharacteristic):
 		self._value_handle = value_handle
 		self.properties = properties
 		self.uuid = uuid
+		self.dropped = 0
+		self._queue_size = 1
+		self._overflow = OVERFLOW_DROP_OLDEST
 		if properties & _FLAG_READ:
 			self._read_event = None
 			self._read_data = None
@@ -214,17 +317,34 @@ class ClientCharacteristic(BaseClientCharacteristic):
 			service._end_handle,
 			uuid,
 		)
-	async def _notified_indicated(self, queue, event, timeout_ms):
+	async def _notified_indicated(self, queue, event, timeout_ms, max_n=0):
 		self._register_with_connection()
-		if len(queue) <= 1:
+		if not queue:
 			with self._connection().timeout(timeout_ms):
-				await event.wait()
-		return queue.popleft()
+				while not queue:
+					await event.wait()
+		if not max_n:
+			return queue.popleft()
+		result = []
+		while queue and max_n:
+			result.append(queue.popleft())
+			max_n -= 1
+		return result
 	async def notified(self, timeout_ms=None):
 		self._check(_FLAG_NOTIFY)
 		return await self._notified_indicated(self._notify_queue, self._notify_event, timeout_ms)
+	async def notified_many(self, max_n=None, timeout_ms=None):
+		self._check(_FLAG_NOTIFY)
+		return await self._notified_indicated(
+			self._notify_queue, self._notify_event, timeout_ms, max_n or -1
+		)
 	def _on_notify_indicate(self, queue, event, data):
 		wake = len(queue) == 0
+		if len(queue) >= self._queue_size:
+			self.dropped += 1
+			if self._overflow == OVERFLOW_DROP_NEWEST:
+				return
+			queue.popleft()
 		queue.append(data)
 		if wake:
 			event.set()
@@ -238,15 +358,36 @@ class ClientCharacteristic(BaseClientCharacteristic):
 		return await self._notified_indicated(
 			self._indicate_queue, self._indicate_event, timeout_ms
 		)
+	async def indicated_many(self, max_n=None, timeout_ms=None):
+		self._check(_FLAG_INDICATE)
+		return await self._notified_indicated(
+			self._indicate_queue, self._indicate_event, timeout_ms, max_n or -1
+		)
 	def _on_indicate(conn_handle, value_handle, indicate_data):
 		if characteristic := ClientCharacteristic._find(conn_handle, value_handle):
 			characteristic._on_notify_indicate(
 				characteristic._indicate_queue, characteristic._indicate_event, indicate_data
 			)
-	async def subscribe(self, notify=True, indicate=False):
+	async def subscribe(self, notify=True, indicate=False, queue_size=None, overflow=OVERFLOW_DROP_OLDEST):
 		self._register_with_connection()
-		if cccd := await self.descriptor(bluetooth.UUID(_CCCD_UUID)):
-			await cccd.write(struct.pack("<H", _CCCD_NOTIFY * notify + _CCCD_INDICATE * indicate))
+		if queue_size:
+			self._queue_size = queue_size
+			self._overflow = overflow
+			if self.properties & _FLAG_NOTIFY:
+				self._notify_queue = deque((), queue_size)
+			if self.properties & _FLAG_INDICATE:
+				self._indicate_queue = deque((), queue_size)
+		data = struct.pack("<H", _CCCD_NOTIFY * notify + _CCCD_INDICATE * indicate)
+		key = "d{}".format(self._value_handle)
+		if handle := _cached(self.connection, key):
+			try:
+				await ClientDescriptor(self, handle, bluetooth.UUID(_CCCD_UUID)).write(data, True)
+			except GattError:
+				clear_cache(self.connection.device)
+				raise
+		elif cccd := await self.descriptor(bluetooth.UUID(_CCCD_UUID)):
+			_cache_put(self.connection, key, cccd._value_handle)
+			await cccd.write(data, True)
 		else:
 			raise ValueError("CCCD not found")
 class ClientDescriptor(BaseClientCharacteristic):
@@ -255,6 +396,11 @@ class ClientDescriptor(BaseClientCharacteristic):
 		self.uuid = uuid
 		self._value_handle = dsc_handle
 		self.properties = _FLAG_READ | _FLAG_WRITE_NO_RESPONSE
+		self._read_event = None
+		self._read_data = None
+		self._read_status = None
+		self._write_event = None
+		self._write_status = None
 	def __str__(self):
 		return "Descriptor: {} {} {} {}".format(
 			self._def_handle, self._value_handle, self.properties, self.uuid
@@ -1,4 +1,5 @@
 import bluetooth
+from time import ticks_us, ticks_diff
 log_level = 1
 def log_error(*args):
 	if log_level > 0:
@@ -23,22 +24,37 @@ def ensure_active():
 def config(*args, **kwargs):
 	ensure_active()
 	return ble.config(*args, **kwargs)
-_irq_handlers = []
+_irq_handlers = {}
 _shutdown_handlers = []
+_irq_stats = None
 def register_irq_handler(irq, shutdown):
 	if irq:
-		_irq_handlers.append(irq)
+		for event, handler in irq.items():
+			assert _irq_handlers.get(event, handler) is handler, event
+			_irq_handlers[event] = handler
 	if shutdown:
 		_shutdown_handlers.append(shutdown)
+def irq_stats(enable=None):
+	global _irq_stats
+	if enable is not None:
+		_irq_stats = {} if enable else None
+	return _irq_stats
 def stop():
 	ble.active(False)
 	for handler in _shutdown_handlers:
 		handler()
 def ble_irq(event, data):
-	log_info(event, data)
-	for handler in _irq_handlers:
-		result = handler(event, data)
-		if result is not None:
-			return result
+	if log_level > 2:
+		log_info(event, data)
+	handler = _irq_handlers.get(event, None)
+	if _irq_stats is None:
+		return handler(data) if handler else None
+	start = ticks_us()
+	result = handler(data) if handler else None
+	if (stats := _irq_stats.get(event, None)) is None:
+		stats = _irq_stats[event] = [0, 0]
+	stats[0] += 1
+	stats[1] += ticks_diff(ticks_us(), start)
+	return result
 ble = bluetooth.BLE()
 ble.irq(ble_irq)
\ No newline at end of file
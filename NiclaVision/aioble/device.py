@@ -1,49 +1,104 @@
 from micropython import const
 import uasyncio as asyncio
 import binascii
+import heapq
+from time import ticks_ms, ticks_diff
 from .core import ble, register_irq_handler, log_error
 _IRQ_MTU_EXCHANGED = const(21)
 class DeviceDisconnectedError(Exception):
 	pass
-def _device_irq(event, data):
-	if event == _IRQ_MTU_EXCHANGED:
-		conn_handle, mtu = data
-		if device := DeviceConnection._connected.get(conn_handle, None):
-			device.mtu = mtu
-			if device._mtu_event:
-				device._mtu_event.set()
-register_irq_handler(_device_irq, None)
+def _irq_mtu_exchanged(data):
+	conn_handle, mtu = data
+	if device := DeviceConnection._connected.get(conn_handle, None):
+		device.mtu = mtu
+		if device._mtu_event:
+			device._mtu_event.set()
+register_irq_handler({_IRQ_MTU_EXCHANGED: _irq_mtu_exchanged}, None)
+class _Deadlines:
+	def __init__(self):
+		self._heap = []
+		self._epoch = ticks_ms()
+		self._seq = 0
+		self._cancelled = 0
+		self._task = None
+		self._flag = None
+		self._sleeping = 0
+		self._woken = False
+	def add(self, timeout):
+		now = ticks_ms()
+		if not self._heap:
+			self._epoch = now
+		elif ticks_diff(now, self._epoch) > 0x10000000:
+			shift = ticks_diff(now, self._epoch)
+			for entry in self._heap:
+				entry[0] -= shift
+			self._epoch = now
+		self._seq = (self._seq + 1) & 0x3FFFFFFF
+		entry = [ticks_diff(now, self._epoch) + timeout._timeout_ms, self._seq, timeout]
+		heapq.heappush(self._heap, entry)
+		if self._task is None or self._task.done():
+			self._flag = asyncio.ThreadSafeFlag()
+			self._task = asyncio.create_task(self._run())
+		elif self._sleeping == 1:
+			self._flag.set()
+		elif self._sleeping == 2 and self._heap[0] is entry and not self._woken:
+			self._woken = True
+			self._task.cancel()
+		return entry
+	def remove(self, entry):
+		entry[2] = None
+		self._cancelled += 1
+		if self._cancelled > 16 and self._cancelled * 2 > len(self._heap):
+			self._heap = [e for e in self._heap if e[2]]
+			heapq.heapify(self._heap)
+			self._cancelled = 0
+	async def _run(self):
+		while True:
+			try:
+				if self._heap:
+					self._sleeping = 2
+					await asyncio.sleep_ms(max(0, self._heap[0][0] - ticks_diff(ticks_ms(), self._epoch)))
+				else:
+					self._sleeping = 1
+					await self._flag.wait()
+			except asyncio.CancelledError:
+				if not self._woken:
+					raise
+			self._sleeping = 0
+			self._woken = False
+			now = ticks_diff(ticks_ms(), self._epoch)
+			while self._heap and self._heap[0][0] <= now:
+				entry = heapq.heappop(self._heap)
+				if timeout := entry[2]:
+					timeout._entry = None
+					timeout._task.cancel()
+				else:
+					self._cancelled -= 1
+_deadlines = _Deadlines()
 class DeviceTimeout:
 	def __init__(self, connection, timeout_ms):
 		self._connection = connection
 		self._timeout_ms = timeout_ms
-		self._timeout_task = None
+		self._entry = None
 		self._task = asyncio.current_task()
 		if connection:
-			connection._timeouts.append(self)
-	async def _timeout_sleep(self):
-		try:
-			await asyncio.sleep_ms(self._timeout_ms)
-		except asyncio.CancelledError:
-			return
-		self._timeout_task = None
-		self._task.cancel()
+			connection._timeouts.add(self)
 	def __enter__(self):
 		if self._timeout_ms:
-			self._timeout_task = asyncio.create_task(self._timeout_sleep())
+			self._entry = _deadlines.add(self)
 	def __exit__(self, exc_type, exc_val, exc_traceback):
 		if self._connection:
-			self._connection._timeouts.remove(self)
+			self._connection._timeouts.discard(self)
 		try:
 			if exc_type == asyncio.CancelledError:
-				if self._timeout_ms and self._timeout_task is None:
+				if self._timeout_ms and self._entry is None:
 					raise asyncio.TimeoutError
 				if self._connection and self._connection._conn_handle is None:
 					raise DeviceDisconnectedError
 				return
 		finally:
-			if self._timeout_task:
-				self._timeout_task.cancel()
+			if self._entry:
+				_deadlines.remove(self._entry)
 class Device:
 	def __init__(self, addr_type, addr):
 		self.addr_type = addr_type
@@ -84,9 +139,10 @@ class DeviceConnection:
 		self._discover = None
 		self._characteristics = {}
 		self._task = None
-		self._timeouts = []
+		self._timeouts = set()
 		self._pair_event = None
 		self._l2cap_channel = None
+		self._cache_modified = False
 	async def device_task(self):
 		assert self._conn_handle is not None
 		await self._event.wait()
@@ -95,6 +151,9 @@ class DeviceConnection:
 		self.device._connection = None
 		for t in self._timeouts:
 			t._task.cancel()
+		if self._cache_modified:
+			from .client import _save_cache
+			_save_cache()
 	def _run_task(self):
 		self._event = self._event or asyncio.ThreadSafeFlag()
 		self._task = asyncio.create_task(self.device_task())
@@ -112,14 +171,21 @@ class DeviceConnection:
 		with DeviceTimeout(None, timeout_ms):
 			await self._task
 	async def service(self, uuid, timeout_ms=2000):
-		result = None
+		from .client import ClientService
+		if result := ClientService._from_cache(self, uuid):
+			return result
 		async for service in self.services(uuid, timeout_ms):
 			if not result and service.uuid == uuid:
 				result = service
+		if result:
+			result._cache()
 		return result
 	def services(self, uuid=None, timeout_ms=2000):
 		from .client import ClientDiscover, ClientService
 		return ClientDiscover(self, ClientService, self, timeout_ms, uuid)
+	async def read_many(self, characteristics, timeout_ms=2000):
+		from .client import read_many
+		return await read_many(self, characteristics, timeout_ms)
 	async def pair(self, *args, **kwargs):
 		from .security import pair
 		await pair(self, *args, **kwargs)
@@ -8,34 +8,43 @@ _IRQ_L2CAP_DISCONNECT = const(24)
 _IRQ_L2CAP_RECV = const(25)
 _IRQ_L2CAP_SEND_READY = const(26)
 _listening = False
-def _l2cap_irq(event, data):
-	if event not in (
-		_IRQ_L2CAP_CONNECT,
-		_IRQ_L2CAP_DISCONNECT,
-		_IRQ_L2CAP_RECV,
-		_IRQ_L2CAP_SEND_READY,
-	):
-		return
+def _channel(data):
 	if connection := DeviceConnection._connected.get(data[0], None):
 		if channel := connection._l2cap_channel:
-			if channel._cid is not None and channel._cid != data[1]:
-				return
-			if event == _IRQ_L2CAP_CONNECT:
-				_, channel._cid, _, channel.our_mtu, channel.peer_mtu = data
-			elif event == _IRQ_L2CAP_DISCONNECT:
-				_, _, psm, status = data
-				channel._status = status
-				channel._cid = None
-				connection._l2cap_channel = None
-			elif event == _IRQ_L2CAP_RECV:
-				channel._data_ready = True
-			elif event == _IRQ_L2CAP_SEND_READY:
-				channel._stalled = False
-			channel._event.set()
+			if channel._cid is None or channel._cid == data[1]:
+				return channel
+def _irq_connect(data):
+	if channel := _channel(data):
+		_, channel._cid, _, channel.our_mtu, channel.peer_mtu = data
+		channel._event.set()
+def _irq_disconnect(data):
+	if channel := _channel(data):
+		_, _, psm, status = data
+		channel._status = status
+		channel._cid = None
+		channel._connection._l2cap_channel = None
+		channel._event.set()
+		channel._send_event.set()
+def _irq_recv(data):
+	if channel := _channel(data):
+		channel._data_ready = True
+		channel._event.set()
+def _irq_send_ready(data):
+	if channel := _channel(data):
+		channel._stalled = False
+		channel._send_event.set()
 def _l2cap_shutdown():
 	global _listening
 	_listening = False
-register_irq_handler(_l2cap_irq, _l2cap_shutdown)
+register_irq_handler(
+	{
+		_IRQ_L2CAP_CONNECT: _irq_connect,
+		_IRQ_L2CAP_DISCONNECT: _irq_disconnect,
+		_IRQ_L2CAP_RECV: _irq_recv,
+		_IRQ_L2CAP_SEND_READY: _irq_send_ready,
+	},
+	_l2cap_shutdown,
+)
 class L2CAPDisconnectedError(Exception):
 	pass
 class L2CAPConnectionError(Exception):
@@ -55,42 +64,47 @@ class L2CAPChannel:
 		self._stalled = False
 		self._data_ready = False
 		self._event = asyncio.ThreadSafeFlag()
+		self._send_event = asyncio.ThreadSafeFlag()
 	def _assert_connected(self):
 		if self._cid is None:
 			raise L2CAPDisconnectedError
 	async def recvinto(self, buf, timeout_ms=None):
 		self._assert_connected()
 		with self._connection.timeout(timeout_ms):
-			while not self._data_ready:
-				await self._event.wait()
-				self._assert_connected()
-		self._assert_connected()
-		n = ble.l2cap_recvinto(self._connection._conn_handle, self._cid, buf)
-		self._data_ready = ble.l2cap_recvinto(self._connection._conn_handle, self._cid, None) > 0
-		return n
+			while True:
+				while not self._data_ready:
+					await self._event.wait()
+					self._assert_connected()
+				self._data_ready = False
+				if n := ble.l2cap_recvinto(self._connection._conn_handle, self._cid, buf):
+					if n == len(buf):
+						self._data_ready = True
+					return n
 	def available(self):
 		self._assert_connected()
 		return self._data_ready
+	def _chunk_size(self):
+		return min(self.our_mtu * 2, self.peer_mtu)
+	async def _send(self, mv, timeout_ms):
+		if self._stalled:
+			await self.flush(timeout_ms)
+		self._stalled = True
+		if ble.l2cap_send(self._connection._conn_handle, self._cid, mv):
+			self._stalled = False
 	async def send(self, buf, timeout_ms=None):
 		self._assert_connected()
-		offset = 0
-		chunk_size = min(self.our_mtu * 2, self.peer_mtu)
+		chunk_size = self._chunk_size()
 		mv = memoryview(buf)
-		while offset < len(buf):
-			if self._stalled:
-				await self.flush(timeout_ms)
-			self._stalled = not ble.l2cap_send(
-				self._connection._conn_handle,
-				self._cid,
-				mv[offset : offset + chunk_size],
-			)
-			offset += chunk_size
+		for offset in range(0, len(buf), chunk_size):
+			await self._send(mv[offset : offset + chunk_size], timeout_ms)
 	async def flush(self, timeout_ms=None):
 		self._assert_connected()
 		with self._connection.timeout(timeout_ms):
 			while self._stalled:
-				await self._event.wait()
+				await self._send_event.wait()
 				self._assert_connected()
+	def stream(self, size=4096):
+		return L2CAPStream(self, size)
 	async def disconnect(self, timeout_ms=1000):
 		if self._cid is None:
 			return
@@ -104,6 +118,110 @@ class L2CAPChannel:
 		return self
 	async def __aexit__(self, exc_type, exc_val, exc_traceback):
 		await self.disconnect()
+class L2CAPStream:
+	def __init__(self, channel, size=4096):
+		self._channel = channel
+		self._ring = bytearray(size)
+		self._mv = memoryview(self._ring)
+		self._head = 0
+		self._count = 0
+		self._taken = 0
+		self._out = bytearray(channel._chunk_size())
+		self._out_mv = memoryview(self._out)
+		self._out_len = 0
+	def _fill(self):
+		channel = self._channel
+		size = len(self._ring)
+		while channel._data_ready and channel._cid is not None and self._count < size:
+			if not self._count:
+				self._head = 0
+			tail = (self._head + self._count) % size
+			free = (size if tail >= self._head else self._head) - tail
+			channel._data_ready = False
+			n = ble.l2cap_recvinto(channel._connection._conn_handle, channel._cid, self._mv[tail : tail + free])
+			if n == free:
+				channel._data_ready = True
+			self._count += n
+			if not n:
+				break
+	async def _wait(self, timeout_ms):
+		channel = self._channel
+		self._consume(self._taken)
+		self._fill()
+		if self._count:
+			return True
+		if channel._cid is None:
+			return False
+		with channel._connection.timeout(timeout_ms):
+			while not self._count:
+				while not channel._data_ready:
+					if channel._cid is None:
+						return False
+					await channel._event.wait()
+				self._fill()
+		return True
+	def _consume(self, n):
+		self._taken = 0
+		self._count -= n
+		self._head = (self._head + n) % len(self._ring)
+	def _readable(self):
+		return self._mv[self._head : min(self._head + self._count, len(self._ring))]
+	async def readinto(self, buf, timeout_ms=None):
+		if not await self._wait(timeout_ms):
+			raise L2CAPDisconnectedError
+		mv = memoryview(buf)
+		n = 0
+		while self._count and n < len(mv):
+			chunk = self._readable()
+			k = min(len(chunk), len(mv) - n)
+			mv[n : n + k] = chunk[:k]
+			self._consume(k)
+			n += k
+		self._fill()
+		return n
+	async def read(self, n=4096, timeout_ms=None):
+		buf = bytearray(n)
+		return bytes(buf[: await self.readinto(buf, timeout_ms)])
+	def __aiter__(self):
+		return self
+	async def __anext__(self):
+		if not await self._wait(None):
+			raise StopAsyncIteration
+		chunk = self._readable()
+		self._taken = len(chunk)
+		return chunk
+	async def write(self, data, timeout_ms=None):
+		channel = self._channel
+		channel._assert_connected()
+		mv = memoryview(data)
+		size = len(self._out)
+		offset = 0
+		if self._out_len:
+			offset = min(size - self._out_len, len(mv))
+			self._out_mv[self._out_len : self._out_len + offset] = mv[:offset]
+			self._out_len += offset
+			if self._out_len < size:
+				return
+			await channel._send(self._out_mv, timeout_ms)
+			self._out_len = 0
+		while len(mv) - offset >= size:
+			await channel._send(mv[offset : offset + size], timeout_ms)
+			offset += size
+		self._out_len = len(mv) - offset
+		self._out_mv[: self._out_len] = mv[offset:]
+	async def drain(self, timeout_ms=None):
+		if self._out_len:
+			await self._channel._send(self._out_mv[: self._out_len], timeout_ms)
+			self._out_len = 0
+		await self._channel.flush(timeout_ms)
+	async def close(self, timeout_ms=1000):
+		if self._channel._cid is not None:
+			await self.drain(timeout_ms)
+		await self._channel.disconnect(timeout_ms)
+	async def __aenter__(self):
+		return self
+	async def __aexit__(self, exc_type, exc_val, exc_traceback):
+		await self.close()
 async def accept(connection, psn, mtu, timeout_ms):
 	global _listening
 	channel = L2CAPChannel(connection)
@@ -24,26 +24,37 @@ _ADV_TYPE_UUID128_MORE = const(0x6)
 _ADV_TYPE_APPEARANCE = const(0x19)
 _ADV_TYPE_MANUFACTURER = const(0xFF)
 _ADV_PAYLOAD_MAX_LEN = const(31)
-_incoming_connection = None
+_incoming = []
 _connect_event = None
-def _peripheral_irq(event, data):
-	global _incoming_connection
-	if event == _IRQ_CENTRAL_CONNECT:
-		conn_handle, addr_type, addr = data
-		device = Device(addr_type, bytes(addr))
-		_incoming_connection = DeviceConnection(device)
-		_incoming_connection._conn_handle = conn_handle
-		DeviceConnection._connected[conn_handle] = _incoming_connection
+def _irq_central_connect(data):
+	conn_handle, addr_type, addr = data
+	device = Device(addr_type, bytes(addr))
+	connection = DeviceConnection(device)
+	connection._conn_handle = conn_handle
+	connection._event = asyncio.ThreadSafeFlag()
+	DeviceConnection._connected[conn_handle] = connection
+	_incoming.append(connection)
+	if _connect_event:
 		_connect_event.set()
-	elif event == _IRQ_CENTRAL_DISCONNECT:
-		conn_handle, _, _ = data
-		if connection := DeviceConnection._connected.get(conn_handle, None):
-			connection._event.set()
+def _irq_central_disconnect(data):
+	conn_handle, _, _ = data
+	if connection := DeviceConnection._connected.get(conn_handle, None):
+		connection._event.set()
 def _peripheral_shutdown():
-	global _incoming_connection, _connect_event
-	_incoming_connection = None
+	global _incoming, _connect_event
+	_incoming = []
 	_connect_event = None
-register_irq_handler(_peripheral_irq, _peripheral_shutdown)
+register_irq_handler(
+	{
+		_IRQ_CENTRAL_CONNECT: _irq_central_connect,
+		_IRQ_CENTRAL_DISCONNECT: _irq_central_disconnect,
+	},
+	_peripheral_shutdown,
+)
+def _accept():
+	connection = _incoming.pop(0)
+	connection._run_task()
+	return connection
 def _append(adv_data, resp_data, adv_type, value):
 	data = struct.pack("BB", len(value) + 1, adv_type) + value
 	if len(data) + len(adv_data) < _ADV_PAYLOAD_MAX_LEN:
@@ -68,8 +79,10 @@ async def advertise(
 	manufacturer=None,
 	timeout_ms=None,
 ):
-	global _incoming_connection, _connect_event
+	global _connect_event
 	ensure_active()
+	if _incoming:
+		return _accept()
 	if not adv_data and not resp_data:
 		adv_data = bytearray()
 		resp_data = _append(
@@ -104,11 +117,9 @@ async def advertise(
 	ble.gap_advertise(interval_us, adv_data=adv_data, resp_data=resp_data, connectable=connectable)
 	try:
 		with DeviceTimeout(None, timeout_ms):
-			await _connect_event.wait()
-		result = _incoming_connection
-		_incoming_connection = None
-		result._run_task()
-		return result
+			while not _incoming:
+				await _connect_event.wait()
+		return _accept()
 	except asyncio.CancelledError:
 		ble.gap_advertise(None)
 	except asyncio.TimeoutError:
@@ -43,55 +43,62 @@ def _save_secrets(arg=None):
 		]
 		json.dump(json_secrets, f)
 		_modified = False
-def _security_irq(event, data):
+def _irq_encryption_update(data):
+	conn_handle, encrypted, authenticated, bonded, key_size = data
+	log_info("encryption update", conn_handle, encrypted, authenticated, bonded, key_size)
+	if connection := DeviceConnection._connected.get(conn_handle, None):
+		connection.encrypted = encrypted
+		connection.authenticated = authenticated
+		connection.bonded = bonded
+		connection.key_size = key_size
+		if encrypted and connection._pair_event:
+			connection._pair_event.set()
+def _irq_set_secret(data):
 	global _modified
-	if event == _IRQ_ENCRYPTION_UPDATE:
-		conn_handle, encrypted, authenticated, bonded, key_size = data
-		log_info("encryption update", conn_handle, encrypted, authenticated, bonded, key_size)
-		if connection := DeviceConnection._connected.get(conn_handle, None):
-			connection.encrypted = encrypted
-			connection.authenticated = authenticated
-			connection.bonded = bonded
-			connection.key_size = key_size
-			if encrypted and connection._pair_event:
-				connection._pair_event.set()
-	elif event == _IRQ_SET_SECRET:
-		sec_type, key, value = data
+	sec_type, key, value = data
+	key = sec_type, bytes(key)
+	value = bytes(value) if value else None
+	log_info("set secret:", key, value)
+	if value is None:
+		if key not in _secrets:
+			return False
+		del _secrets[key]
+	else:
+		_secrets[key] = value
+	_modified = True
+	schedule(_save_secrets, None)
+	return True
+def _irq_get_secret(data):
+	sec_type, index, key = data
+	log_info("get secret:", sec_type, index, bytes(key) if key else None)
+	if key is None:
+		i = 0
+		for (t, _key), value in _secrets.items():
+			if t == sec_type:
+				if i == index:
+					return value
+				i += 1
+		return None
+	else:
 		key = sec_type, bytes(key)
-		value = bytes(value) if value else None
-		log_info("set secret:", key, value)
-		if value is None:
-			if key not in _secrets:
-				return False
-			del _secrets[key]
-		else:
-			_secrets[key] = value
-		_modified = True
-		schedule(_save_secrets, None)
-		return True
-	elif event == _IRQ_GET_SECRET:
-		sec_type, index, key = data
-		log_info("get secret:", sec_type, index, bytes(key) if key else None)
-		if key is None:
-			i = 0
-			for (t, _key), value in _secrets.items():
-				if t == sec_type:
-					if i == index:
-						return value
-					i += 1
-			return None
-		else:
-			key = sec_type, bytes(key)
-			return _secrets.get(key, None)
-	elif event == _IRQ_PASSKEY_ACTION:
-		conn_handle, action, passkey = data
-		log_info("passkey action", conn_handle, action, passkey)
+		return _secrets.get(key, None)
+def _irq_passkey_action(data):
+	conn_handle, action, passkey = data
+	log_info("passkey action", conn_handle, action, passkey)
 def _security_shutdown():
 	global _secrets, _modified, _path
 	_secrets = {}
 	_modified = False
 	_path = None
-register_irq_handler(_security_irq, _security_shutdown)
+register_irq_handler(
+	{
+		_IRQ_ENCRYPTION_UPDATE: _irq_encryption_update,
+		_IRQ_SET_SECRET: _irq_set_secret,
+		_IRQ_GET_SECRET: _irq_get_secret,
+		_IRQ_PASSKEY_ACTION: _irq_passkey_action,
+	},
+	_security_shutdown,
+)
 async def pair(
 	connection,
 	bond=True,
@@ -30,20 +30,26 @@ _FLAG_WRITE_CAPTURE = const(0x10000)
 _FLAG_DESC_READ = const(1)
 _FLAG_DESC_WRITE = const(2)
 _WRITE_CAPTURE_QUEUE_LIMIT = const(10)
-def _server_irq(event, data):
-	if event == _IRQ_GATTS_WRITE:
-		conn_handle, attr_handle = data
-		Characteristic._remote_write(conn_handle, attr_handle)
-	elif event == _IRQ_GATTS_READ_REQUEST:
-		conn_handle, attr_handle = data
-		return Characteristic._remote_read(conn_handle, attr_handle)
-	elif event == _IRQ_GATTS_INDICATE_DONE:
-		conn_handle, value_handle, status = data
-		Characteristic._indicate_done(conn_handle, value_handle, status)
+def _irq_write(data):
+	conn_handle, attr_handle = data
+	Characteristic._remote_write(conn_handle, attr_handle)
+def _irq_read_request(data):
+	conn_handle, attr_handle = data
+	return Characteristic._remote_read(conn_handle, attr_handle)
+def _irq_indicate_done(data):
+	conn_handle, value_handle, status = data
+	Characteristic._indicate_done(conn_handle, value_handle, status)
 def _server_shutdown():
 	global _registered_characteristics
 	_registered_characteristics = {}
-register_irq_handler(_server_irq, _server_shutdown)
+register_irq_handler(
+	{
+		_IRQ_GATTS_WRITE: _irq_write,
+		_IRQ_GATTS_READ_REQUEST: _irq_read_request,
+		_IRQ_GATTS_INDICATE_DONE: _irq_indicate_done,
+	},
+	_server_shutdown,
+)
 class Service:
 	def __init__(self, uuid):
 		self.uuid = uuid
@@ -134,6 +140,17 @@ class Characteristic(BaseCharacteristic):
 		if not (self.flags & _FLAG_NOTIFY):
 			raise ValueError("Not supported")
 		ble.gatts_notify(connection._conn_handle, self._value_handle, data)
+	def notify_all(self, data=None, connections=None):
+		if not (self.flags & (_FLAG_NOTIFY | _FLAG_INDICATE)):
+			raise ValueError("Not supported")
+		if connections is None:
+			ble.gatts_write(self._value_handle, self.read() if data is None else data, True)
+			return
+		if data is not None:
+			ble.gatts_write(self._value_handle, data)
+		for connection in connections:
+			if connection.is_connected():
+				ble.gatts_notify(connection._conn_handle, self._value_handle)
 	async def indicate(self, connection, timeout_ms=1000):
 		if not (self.flags & _FLAG_INDICATE):
 			raise ValueError("Not supported")
@@ -0,0 +1,52 @@
+# Sends EVENTS notifications and scan results through aioble's IRQ handler and
+# reports the cost of each, then repeats with irq_stats() enabled and prints the
+# per event counters it collected.
+#
+# Usage: python3 bench_irq.py [EVENTS]
+
+import asyncio, sys, time
+import stubs
+import aioble, bluetooth
+from aioble.device import DeviceConnection
+from aioble.client import ClientService, ClientCharacteristic
+
+_IRQ_SCAN_RESULT = 5
+_IRQ_SCAN_DONE = 6
+_IRQ_GATTC_NOTIFY = 18
+
+CONN_HANDLE = 1
+
+
+def send(events, event, data):
+    start = time.perf_counter()
+    for _ in range(events):
+        stubs.irq(event, data)
+    return (time.perf_counter() - start) / events
+
+
+async def run(events):
+    connection = DeviceConnection(aioble.Device(aioble.ADDR_PUBLIC, "a8:61:0a:00:00:01"))
+    connection._conn_handle = CONN_HANDLE
+    DeviceConnection._connected[CONN_HANDLE] = connection
+    service = ClientService(connection, 0x10, 0x28, bluetooth.UUID(0x181A))
+    characteristic = ClientCharacteristic(service, 0x11, 0x12, 0x12, bluetooth.UUID(0x2A6E))
+    characteristic._register_with_connection()
+    notify = (CONN_HANDLE, 0x12, memoryview(b"\x00\x00\xb4\x41"))
+    scan_result = (0, memoryview(stubs.random_addr(1)), 0, -50, memoryview(b"\x02\x01\x06"))
+    async with aioble.scan(0, name="Nicla") as scanner:
+        for stats in (False, True):
+            aioble.irq_stats(stats)
+            print("irq_stats %s:" % ("enabled" if stats else "disabled"))
+            print("  notification: %5.2f us/event" % (send(events, _IRQ_GATTC_NOTIFY, notify) * 1e6))
+            print("  scan result:  %5.2f us/event" % (send(events, _IRQ_SCAN_RESULT, scan_result) * 1e6))
+        for event, (count, us) in sorted(aioble.irq_stats().items()):
+            print("event %2d: %d calls, %d us in handlers" % (event, count, us))
+        stubs.irq(_IRQ_SCAN_DONE, None)
+
+
+def main():
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Streams TOTAL bytes written in WRITE byte pieces over an L2CAP channel between
+# two connections of a stubbed loopback link, once with send()/recvinto() and
+# once with the channel's stream(). The link carries at most SDUS_PER_EVENT SDUs
+# every INTERVAL_MS and the receiver grants CREDITS SDUs at a time, like a
+# credit based connection oriented channel.
+#
+# Usage: python3 bench_l2cap.py [TOTAL] [WRITE]
+
+import asyncio, sys, time
+import stubs
+import aioble
+from aioble.core import ble
+from aioble.device import DeviceConnection
+from aioble.l2cap import L2CAPChannel
+
+_IRQ_L2CAP_RECV = 25
+_IRQ_L2CAP_SEND_READY = 26
+
+INTERVAL_MS = 7.5
+SDUS_PER_EVENT = 4
+CREDITS = 8
+MTU = 512
+CID = 0x40
+SENDER, RECEIVER = 1, 2
+
+
+class Link:
+    def __init__(self):
+        self.tx = []
+        self.rx = []
+        self.offset = 0
+        self.in_flight = 0
+        self.stalled = False
+        self.sdus = 0
+        self.recvinto_calls = 0
+
+    # Returns False once the peer has no credits left, SEND_READY follows
+    def l2cap_send(self, conn_handle, cid, buf):
+        self.tx.append(bytes(buf))
+        self.in_flight += 1
+        self.sdus += 1
+        self.stalled = self.in_flight >= CREDITS
+        return not self.stalled
+
+    def l2cap_recvinto(self, conn_handle, cid, buf):
+        self.recvinto_calls += 1
+        if buf is None:
+            return len(self.rx[0]) - self.offset if self.rx else 0
+        n = 0
+        while self.rx and n < len(buf):
+            sdu = self.rx[0]
+            k = min(len(buf) - n, len(sdu) - self.offset)
+            buf[n : n + k] = sdu[self.offset : self.offset + k]
+            n += k
+            self.offset += k
+            if self.offset == len(sdu):
+                self.rx.pop(0)
+                self.offset = 0
+                self.in_flight -= 1
+                if self.stalled:
+                    self.stalled = False
+                    asyncio.get_running_loop().call_soon(stubs.irq, _IRQ_L2CAP_SEND_READY, (SENDER, CID))
+        return n
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(INTERVAL_MS / 1000)
+            if self.tx:
+                self.rx.extend(self.tx[:SDUS_PER_EVENT])
+                del self.tx[:SDUS_PER_EVENT]
+                stubs.irq(_IRQ_L2CAP_RECV, (RECEIVER, CID))
+
+
+def channel(conn_handle):
+    connection = DeviceConnection(aioble.Device(aioble.ADDR_PUBLIC, "a8:61:0a:00:00:%02x" % conn_handle))
+    connection._conn_handle = conn_handle
+    DeviceConnection._connected[conn_handle] = connection
+    channel = L2CAPChannel(connection)
+    channel._cid = CID
+    channel.our_mtu = channel.peer_mtu = MTU
+    return channel
+
+
+async def send_recvinto(sender, receiver, total, write):
+    async def produce():
+        data = bytes(write)
+        for _ in range(total // write):
+            await sender.send(data)
+        await sender.flush()
+
+    async def consume():
+        buf = bytearray(MTU)
+        received = 0
+        while received < total:
+            received += await receiver.recvinto(buf)
+
+    await asyncio.gather(produce(), consume())
+
+
+async def stream(sender, receiver, total, write):
+    async def produce():
+        writer = sender.stream()
+        data = bytes(write)
+        for _ in range(total // write):
+            await writer.write(data)
+        await writer.drain()
+
+    async def consume():
+        received = 0
+        async for chunk in receiver.stream():
+            received += len(chunk)
+            if received >= total:
+                break
+
+    await asyncio.gather(produce(), consume())
+
+
+async def run(total, write):
+    for name, transfer in (("send/recvinto", send_recvinto), ("stream", stream)):
+        link = Link()
+        ble.handlers["l2cap_send"] = link.l2cap_send
+        ble.handlers["l2cap_recvinto"] = link.l2cap_recvinto
+        task = asyncio.create_task(link.run())
+        sender, receiver = channel(SENDER), channel(RECEIVER)
+        start = time.perf_counter()
+        await transfer(sender, receiver, total // write * write, write)
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        for c in (sender, receiver):
+            c._connection._l2cap_channel = None
+        print(
+            "%-14s %7.1f kB/s, %5d SDUs of %5.1f bytes, %5d recvinto calls"
+            % (name, total / elapsed / 1000, link.sdus, total / link.sdus, link.recvinto_calls)
+        )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 16384
+    write = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print("%d bytes in %d byte writes, %d byte MTU, %d credits" % (total, write, MTU, CREDITS))
+    asyncio.run(run(total, write))
+
+
+if __name__ == "__main__":
+    main()
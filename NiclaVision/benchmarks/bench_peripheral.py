@@ -0,0 +1,137 @@
+# Simulates CENTRALS gateways connecting to the people counter, which keeps
+# advertising while at most MAX_CONNECTIONS of them are connected. Every
+# connected central subscribes to the count, which is updated UPDATES times with
+# one notify_all() call. Checks that each subscribed central got every update and
+# reports the controller calls a fan-out costs.
+#
+# Usage: python3 bench_peripheral.py [CENTRALS] [UPDATES]
+
+import asyncio, random, sys, time
+import stubs
+import aioble, bluetooth
+from aioble import peripheral, server
+from aioble.core import ble
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+
+MAX_CONNECTIONS = 3
+
+
+# The controller notifies every central that subscribed when a value is
+# written with send_update, like the real stack does from the CCCDs
+class Controller:
+    def __init__(self):
+        self.advertising = False
+        self.subscribed = set()
+        self.values = {}
+        self.received = {}
+
+    def gap_advertise(self, interval_us, *args, **kwargs):
+        self.advertising = interval_us is not None
+
+    def gatts_register_services(self, services):
+        return [[0x10 + n for n in range(len(characteristics))] for _, characteristics in services]
+
+    def gatts_write(self, value_handle, data, send_update=False):
+        self.values[value_handle] = bytes(data)
+        if send_update:
+            for conn_handle in self.subscribed:
+                self.received[conn_handle].append(self.values[value_handle])
+
+    def gatts_read(self, value_handle):
+        return self.values.get(value_handle, b"")
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        self.received[conn_handle].append(self.values[value_handle] if data is None else bytes(data))
+
+    def gap_disconnect(self, conn_handle):
+        asyncio.get_running_loop().call_soon(self.disconnect, conn_handle)
+
+    # Connecting is only possible while advertising, which then stops
+    def connect(self, conn_handle):
+        if not self.advertising:
+            return False
+        self.advertising = False
+        self.received[conn_handle] = []
+        self.subscribed.add(conn_handle)
+        stubs.irq(_IRQ_CENTRAL_CONNECT, (conn_handle, 0, stubs.random_addr(conn_handle)))
+        return True
+
+    def disconnect(self, conn_handle):
+        self.subscribed.discard(conn_handle)
+        stubs.irq(_IRQ_CENTRAL_DISCONNECT, (conn_handle, 0, stubs.random_addr(conn_handle)))
+
+
+async def serve(connections, slot_free):
+    while True:
+        while len(connections) >= MAX_CONNECTIONS:
+            slot_free.clear()
+            await slot_free.wait()
+        connection = await peripheral.advertise(100000, name=b"NICLA-VISION")
+        if not connection:
+            return
+        connections.append(connection)
+        asyncio.create_task(hold(connection, connections, slot_free))
+
+
+async def hold(connection, connections, slot_free):
+    await connection.disconnected(timeout_ms=None)
+    connections.remove(connection)
+    slot_free.set()
+
+
+# Each central retries until it can connect, stays a while and leaves
+async def central(controller, conn_handle, stay):
+    while not controller.connect(conn_handle):
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(stay)
+    controller.disconnect(conn_handle)
+
+
+async def run(centrals, updates):
+    controller = Controller()
+    for name in ("gap_advertise", "gatts_register_services", "gatts_write", "gatts_read", "gatts_notify", "gap_disconnect"):
+        ble.handlers[name] = getattr(controller, name)
+    service = server.Service(bluetooth.UUID(0x181A))
+    characteristic = server.Characteristic(service, bluetooth.UUID(0x2A1C), read=True, notify=True)
+    server.register_services(service)
+    connections = []
+    slot_free = asyncio.Event()
+    task = asyncio.create_task(serve(connections, slot_free))
+    random.seed(0)
+    visitors = [asyncio.create_task(central(controller, n + 1, 0.05 + random.random() * 0.1)) for n in range(centrals)]
+    peak = 0
+    connected = 0
+    sent = {}
+    elapsed = 0
+    calls = 0
+    for update in range(updates):
+        await asyncio.sleep(0.0005)
+        peak = max(peak, len(connections))
+        connected += len(controller.subscribed)
+        value = update.to_bytes(4, "little")
+        for conn_handle in controller.subscribed:
+            sent.setdefault(conn_handle, []).append(value)
+        before = len(ble.calls)
+        start = time.perf_counter()
+        characteristic.notify_all(value)
+        elapsed += time.perf_counter() - start
+        calls += len(ble.calls) - before
+    await asyncio.gather(*visitors)
+    task.cancel()
+    missing = sum(1 for conn_handle, values in sent.items() if controller.received[conn_handle] != values)
+    print("%d centrals served, at most %d at a time" % (len(controller.received), peak))
+    print("notify_all: %.2f us and %.1f controller calls per update to %.1f centrals" % (elapsed / updates * 1e6, calls / updates, connected / updates))
+    if len(controller.received) != centrals or missing:
+        sys.exit("%d centrals missed updates" % missing)
+
+
+def main():
+    centrals = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(run(centrals, updates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Reads the six Nicla Sense characteristics one await after the other and with
+# connection.read_many, against a stubbed link with a connection event every
+# INTERVAL_MS. Like on a real ATT bearer one request is in flight at a time: a
+# request goes out at the next connection event and its response comes back at
+# the following one, where the next queued request can go out.
+#
+# Usage: python3 bench_read_many.py [CYCLES]
+
+import asyncio, sys, time
+import stubs
+import aioble, bluetooth
+from aioble.core import ble
+from aioble.device import DeviceConnection
+from aioble.client import ClientService, ClientCharacteristic
+
+_IRQ_GATTC_READ_RESULT = 15
+_IRQ_GATTC_READ_DONE = 16
+
+INTERVAL_MS = 15
+CONN_HANDLE = 1
+VALUE_HANDLES = (0x12, 0x16, 0x1A, 0x1E, 0x22, 0x26)
+
+
+class Link:
+    def __init__(self):
+        self.queue = []
+        self.in_flight = None
+
+    def gattc_read(self, conn_handle, value_handle):
+        self.queue.append(value_handle)
+
+    # Every connection event delivers the pending response and sends the next request
+    async def run(self):
+        while True:
+            await asyncio.sleep(INTERVAL_MS / 1000)
+            if self.in_flight is not None:
+                stubs.irq(_IRQ_GATTC_READ_RESULT, (CONN_HANDLE, self.in_flight, b"\x00\x00\xb4\x41"))
+                stubs.irq(_IRQ_GATTC_READ_DONE, (CONN_HANDLE, self.in_flight, 0))
+                self.in_flight = None
+            if self.queue:
+                self.in_flight = self.queue.pop(0)
+
+
+async def run(cycles):
+    link = Link()
+    ble.handlers["gattc_read"] = link.gattc_read
+    task = asyncio.create_task(link.run())
+    connection = DeviceConnection(aioble.Device(aioble.ADDR_PUBLIC, "a8:61:0a:00:00:01"))
+    connection._conn_handle = CONN_HANDLE
+    DeviceConnection._connected[CONN_HANDLE] = connection
+    service = ClientService(connection, 0x10, 0x28, bluetooth.UUID(0x181A))
+    characteristics = [ClientCharacteristic(service, handle - 1, handle, 0x12, bluetooth.UUID(0x2A6E)) for handle in VALUE_HANDLES]
+    start = time.perf_counter()
+    for _ in range(cycles):
+        for characteristic in characteristics:
+            await characteristic.read()
+    sequential = (time.perf_counter() - start) / cycles
+    start = time.perf_counter()
+    for _ in range(cycles):
+        await connection.read_many(characteristics)
+    pipelined = (time.perf_counter() - start) / cycles
+    task.cancel()
+    print("%d reads per cycle, %d ms connection interval" % (len(characteristics), INTERVAL_MS))
+    print("one after the other: %6.1f ms/cycle" % (sequential * 1000))
+    print("read_many:           %6.1f ms/cycle" % (pipelined * 1000))
+
+
+def main():
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Measures the time from connecting to a peripheral to its first notification:
+# connect, find the service and the characteristic, subscribe and wait. The
+# controller is stubbed with a peripheral answering every GATT procedure after
+# INTERVAL_MS per round trip, so only round trips are counted. The first
+# connection discovers the attributes, reconnections find them in the cache and
+# a restart loads them from the cache file. Until load_cache() is called no
+# handles are reused across connections, so every connection discovers them.
+#
+# Usage: python3 bench_reconnect.py [RECONNECTS]
+
+import asyncio, os, sys, tempfile, time
+import stubs
+import aioble, bluetooth
+import aioble.client
+from aioble.core import ble
+
+_IRQ_PERIPHERAL_CONNECT = 7
+_IRQ_PERIPHERAL_DISCONNECT = 8
+_IRQ_GATTC_SERVICE_RESULT = 9
+_IRQ_GATTC_SERVICE_DONE = 10
+_IRQ_GATTC_CHARACTERISTIC_RESULT = 11
+_IRQ_GATTC_CHARACTERISTIC_DONE = 12
+_IRQ_GATTC_DESCRIPTOR_RESULT = 13
+_IRQ_GATTC_DESCRIPTOR_DONE = 14
+_IRQ_GATTC_WRITE_DONE = 17
+_IRQ_GATTC_NOTIFY = 18
+
+INTERVAL_MS = 30
+CONN_HANDLE = 1
+
+# The Nicla Sense environmental service: start, end and characteristics as
+# (definition handle, value handle, properties, uuid), each followed by its CCCD
+SERVICE = (0x181A, 0x0010, 0x0028)
+CHARACTERISTICS = [(0x0011 + 4 * n, 0x0012 + 4 * n, 0x12, uuid) for n, uuid in enumerate((0x2A6E, 0x2A6F, 0x2A6D, 0x2BD3, 0x2BD0, 0x2A1C))]
+TEMPERATURE = bluetooth.UUID(0x2A6E)
+
+
+# Answers a procedure after the given number of round trips
+def later(round_trips, *events):
+    loop = asyncio.get_running_loop()
+    for event, data in events:
+        loop.call_later(round_trips * INTERVAL_MS / 1000, stubs.irq, event, data)
+
+
+def gap_connect(addr_type, addr, *args):
+    later(1, (_IRQ_PERIPHERAL_CONNECT, (CONN_HANDLE, addr_type, addr)))
+
+
+def gap_disconnect(conn_handle):
+    later(1, (_IRQ_PERIPHERAL_DISCONNECT, (conn_handle, 0, b"")))
+
+
+def gattc_discover_services(conn_handle, uuid):
+    later(2, (_IRQ_GATTC_SERVICE_RESULT, (conn_handle, SERVICE[1], SERVICE[2], SERVICE[0])), (_IRQ_GATTC_SERVICE_DONE, (conn_handle, 0)))
+
+
+# Read By Type over the whole service, a few characteristics per response
+def gattc_discover_characteristics(conn_handle, start_handle, end_handle, uuid):
+    results = [(_IRQ_GATTC_CHARACTERISTIC_RESULT, (conn_handle,) + c) for c in CHARACTERISTICS if uuid is None or bluetooth.UUID(c[3]) == uuid]
+    later(len(CHARACTERISTICS) // 3 + 1, *results, (_IRQ_GATTC_CHARACTERISTIC_DONE, (conn_handle, 0)))
+
+
+def gattc_discover_descriptors(conn_handle, start_handle, end_handle):
+    results = [(_IRQ_GATTC_DESCRIPTOR_RESULT, (conn_handle, handle, 0x2902 if handle == start_handle + 1 else 0x2803)) for handle in range(start_handle, end_handle + 1)]
+    later(2, *results, (_IRQ_GATTC_DESCRIPTOR_DONE, (conn_handle, 0)))
+
+
+# Writing a CCCD makes the peripheral notify the characteristic right away
+def gattc_write(conn_handle, value_handle, data, mode):
+    events = [(_IRQ_GATTC_NOTIFY, (conn_handle, value_handle - 1, b"\x00\x00\xb4\x41"))]
+    if mode:
+        events.insert(0, (_IRQ_GATTC_WRITE_DONE, (conn_handle, value_handle, 0)))
+    later(1, *events)
+
+
+async def first_notification(device):
+    start = time.perf_counter()
+    connection = await device.connect()
+    service = await connection.service(bluetooth.UUID(SERVICE[0]))
+    characteristic = await service.characteristic(TEMPERATURE)
+    await characteristic.subscribe(notify=True)
+    await characteristic.notified()
+    elapsed = time.perf_counter() - start
+    await connection.disconnect()
+    return elapsed
+
+
+async def run(reconnects, path):
+    device = aioble.Device(aioble.ADDR_PUBLIC, "a8:61:0a:00:00:01")
+    first = await first_notification(device)
+    again = await first_notification(device)
+    print("cache not loaded:     %6.1f ms, then %6.1f ms" % (first * 1000, again * 1000))
+    if again < first * 0.9:
+        sys.exit("handles were reused without load_cache()")
+    aioble.client.load_cache(path)
+    print("first connection:     %6.1f ms" % (await first_notification(device) * 1000))
+    elapsed = [await first_notification(device) for _ in range(reconnects)]
+    print("reconnection:         %6.1f ms" % (sum(elapsed) / reconnects * 1000))
+    aioble.client.load_cache(path)
+    print("after a restart:      %6.1f ms" % (await first_notification(device) * 1000))
+    aioble.client.clear_cache()
+    print("without a cache:      %6.1f ms" % (await first_notification(device) * 1000))
+
+
+def main():
+    reconnects = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name in ("gap_connect", "gap_disconnect", "gattc_discover_services", "gattc_discover_characteristics", "gattc_discover_descriptors", "gattc_write"):
+        ble.handlers[name] = globals()[name]
+    print("%d ms per round trip" % INTERVAL_MS)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(reconnects, os.path.join(directory, "ble_gatt_cache.json")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Feeds synthetic _IRQ_SCAN_RESULT events from a growing number of advertisers
+# through aioble.scan and reports the cost of each advertising report, which
+# should stay flat as the number of advertisers grows. Reports arrive in bursts
+# of BURST between two runs of the consumer, the ones that don't fit in the scan
+# queue are coalesced with a queued report from the same advertiser or dropped.
+#
+# Usage: python3 bench_scan.py [REPORTS] [MAX_RESULTS] [BURST]
+
+import asyncio, sys, time
+import stubs
+import aioble
+
+_IRQ_SCAN_RESULT = 5
+_IRQ_SCAN_DONE = 6
+_ADV_IND = 0
+
+ADVERTISERS = (10, 100, 500, 1000, 5000)
+
+
+async def producer(reports, advertisers, burst):
+    adv_data = bytes((2, 0x01, 0x06, 5, 0x09)) + b"room"
+    addrs = [stubs.random_addr(n) for n in range(advertisers)]
+    for n in range(reports):
+        stubs.irq(_IRQ_SCAN_RESULT, (1, memoryview(addrs[n % advertisers]), _ADV_IND, -40 - n // advertisers % 50, memoryview(adv_data)))
+        if n % burst == burst - 1:
+            await asyncio.sleep(0)
+    stubs.irq(_IRQ_SCAN_DONE, None)
+
+
+async def run(reports, advertisers, max_results, burst):
+    updates = 0
+    async with aioble.scan(0, max_results=max_results) as scanner:
+        task = asyncio.create_task(producer(reports, advertisers, burst))
+        start = time.perf_counter()
+        async for result in scanner:
+            updates += 1
+        elapsed = time.perf_counter() - start
+        await task
+    return elapsed, updates, len(scanner._results), scanner.dropped, scanner.coalesced
+
+
+def main():
+    reports = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_results = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] != "-" else None
+    burst = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    print("%d reports in bursts of %d, max_results=%s" % (reports, burst, max_results))
+    for advertisers in ADVERTISERS:
+        elapsed, updates, kept, dropped, coalesced = asyncio.run(run(reports, advertisers, max_results, burst))
+        print(
+            "%5d advertisers: %6.2f us/report, %d updates, %d results kept, %d dropped, %d coalesced"
+            % (advertisers, elapsed / reports * 1e6, updates, kept, dropped, coalesced)
+        )
+
+
+if __name__ == "__main__":
+    main()
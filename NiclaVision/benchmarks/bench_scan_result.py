@@ -0,0 +1,55 @@
+# Queries name(), services() and manufacturer() on the same ScanResult over and
+# over, with the advertising payload looked up in its parsed field index and, for
+# comparison, re-walked and sliced on every query like aioble used to.
+#
+# Usage: python3 bench_scan_result.py [QUERIES]
+
+import sys, time
+import stubs
+from aioble.central import ScanResult
+from aioble import Device
+
+_ADV_IND = 0
+_SCAN_RSP = 4
+
+
+# The previous ScanResult._decode_field
+def walk_and_slice(self, *adv_type):
+    for payload in (self.adv_data, self.resp_data):
+        if not payload:
+            continue
+        i = 0
+        while i + 1 < len(payload):
+            if payload[i + 1] in adv_type:
+                yield payload[i + 2 : i + payload[i] + 1]
+            i += 1 + payload[i]
+
+
+def query(result, queries):
+    start = time.perf_counter()
+    for _ in range(queries):
+        result.name()
+        for uuid in result.services():
+            pass
+        for manufacturer in result.manufacturer(0x0059):
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    adv_data = bytes((2, 0x01, 0x06, 7, 0x03, 0x1A, 0x18, 0x0F, 0x18, 0x0A, 0x18, 7, 0xFF, 0x59, 0x00, 1, 2, 3, 4))
+    resp_data = bytes((12, 0x09)) + b"NiclaVision"
+    result = ScanResult(Device(0, stubs.random_addr(1)))
+    result._update(_ADV_IND, -50, adv_data)
+    result._update(_SCAN_RSP, -50, resp_data)
+    indexed = query(result, queries)
+    ScanResult._decode_field = walk_and_slice
+    walked = query(result, queries)
+    print("%d queries of name, services and manufacturer" % queries)
+    print("walk and slice: %6.2f us/query" % (walked / queries * 1e6))
+    print("field index:    %6.2f us/query" % (indexed / queries * 1e6))
+
+
+if __name__ == "__main__":
+    main()
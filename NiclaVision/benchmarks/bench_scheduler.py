@@ -0,0 +1,114 @@
+# Replays a recording of 30x30 grayscale frames, one every FRAME_MS, through the
+# fixed 5 s detection cadence and through the adaptive InferenceScheduler, with
+# a detector that always finds the recorded count. Reports the inferences each
+# one ran, how long they took to report a change of the count and for how long
+# the reported count was wrong.
+#
+# A recording is a file of 901 byte records, the count followed by the frame.
+# Without one a room is simulated where two people come in, sit and leave.
+#
+# Usage: python3 bench_scheduler.py [RECORDING]
+
+import random, sys
+import stubs
+from scheduler import MotionGate, InferenceScheduler
+
+FRAME_MS = 100
+SIZE = 30
+FIXED_MS = 5000
+
+
+# Frames of an empty room, a gradient with sensor noise, where people show up
+# as bright blobs walking in from the left edge to their seat and back out
+def simulate():
+    random.seed(0)
+    background = [40 + (i % SIZE) * 3 + (i // SIZE) * 2 for i in range(SIZE * SIZE)]
+    # (enters at, leaves at, seat column, seat row) in seconds and pixels
+    people = [(123.3, 612.9, 12, 8), (301.7, 907.2, 20, 18)]
+    walk = 4
+    noise = [int(random.gauss(0, 3)) for _ in range(4 * SIZE * SIZE)]
+    recording = []
+    for tick in range(1200 * 1000 // FRAME_MS):
+        now = tick * FRAME_MS / 1000
+        offset = random.randrange(3 * SIZE * SIZE)
+        frame = bytearray(min(255, max(0, value + noise[offset + i])) for i, value in enumerate(background))
+        count = 0
+        for enters, leaves, x, y in people:
+            if now < enters or now >= leaves + walk:
+                continue
+            count += 1
+            if now < enters + walk:
+                x = int(x * (now - enters) / walk)
+            elif now >= leaves:
+                x = int(x * (1 - (now - leaves) / walk))
+            elif random.random() < 0.01:
+                x += 1
+            for row in range(y, y + 8):
+                for column in range(x, min(x + 4, SIZE)):
+                    frame[row * SIZE + column] = min(255, frame[row * SIZE + column] + 60)
+        recording.append((count, frame))
+    return recording
+
+
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    record = SIZE * SIZE + 1
+    return [(data[n], data[n + 1 : n + record]) for n in range(0, len(data) - record + 1, record)]
+
+
+# Runs a policy over the recording, returning the reported count at every frame
+def replay(recording, policy):
+    reported = []
+    count = 0
+    due = 0
+    for tick, (truth, frame) in enumerate(recording):
+        now = tick * FRAME_MS
+        if now >= due:
+            count, delay = policy(frame, truth, count, now)
+            due = now + delay
+        reported.append(count)
+    return reported
+
+
+def report(name, recording, reported, inferences):
+    truth = [count for count, _ in recording]
+    wrong = sum(1 for t, r in zip(truth, reported) if t != r) * FRAME_MS / 1000
+    latencies = []
+    for tick in range(1, len(truth)):
+        if truth[tick] != truth[tick - 1]:
+            end = tick
+            while end < len(truth) and reported[end] != truth[tick] and truth[end] == truth[tick]:
+                end += 1
+            latencies.append((end - tick) * FRAME_MS)
+    print(
+        "%-9s %5d inferences, change reported after %5.0f ms on average, %5.1f s wrong"
+        % (name, inferences, sum(latencies) / len(latencies), wrong)
+    )
+
+
+def main():
+    recording = load(sys.argv[1]) if len(sys.argv) > 1 else simulate()
+    print("%d frames, %d s" % (len(recording), len(recording) * FRAME_MS / 1000))
+
+    def fixed(frame, truth, count, now):
+        return truth, FIXED_MS
+
+    report("fixed", recording, replay(recording, fixed), len(recording) * FRAME_MS // FIXED_MS)
+    scheduler = InferenceScheduler(MotionGate())
+    snapshots = [0]
+
+    def adaptive(frame, truth, count, now):
+        snapshots[0] += 1
+        if scheduler.should_detect(stubs.GrayImage(frame), now):
+            scheduler.detected(truth, now)
+            count = truth
+        return count, scheduler.delay_ms(now)
+
+    reported = replay(recording, adaptive)
+    report("adaptive", recording, reported, scheduler.detections)
+    print("adaptive  %5d snapshots, %d without inference" % (snapshots[0], scheduler.skipped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Stress test of the operation timeouts: WORKERS tasks read characteristics of
+# one connection OPS times each with a timeout, against a stubbed peripheral
+# answering most reads after a few milliseconds and never answering the rest.
+# Checks that exactly the unanswered reads time out and counts the tasks that
+# were created along the way.
+#
+# Usage: python3 bench_timeouts.py [OPS] [WORKERS]
+
+import asyncio, random, sys, time
+import stubs
+import aioble, bluetooth
+from aioble.core import ble
+from aioble.device import DeviceConnection
+from aioble.client import ClientService, ClientCharacteristic
+
+_IRQ_GATTC_READ_RESULT = 15
+_IRQ_GATTC_READ_DONE = 16
+
+CONN_HANDLE = 1
+TIMEOUT_MS = 20
+UNANSWERED = 0.05
+
+
+def gattc_read(conn_handle, value_handle):
+    global unanswered
+    if random.random() < UNANSWERED:
+        unanswered += 1
+        return
+    loop = asyncio.get_running_loop()
+    delay = random.random() * TIMEOUT_MS / 4000
+    loop.call_later(delay, stubs.irq, _IRQ_GATTC_READ_RESULT, (CONN_HANDLE, value_handle, b"\x00\x00\xb4\x41"))
+    loop.call_later(delay, stubs.irq, _IRQ_GATTC_READ_DONE, (CONN_HANDLE, value_handle, 0))
+
+
+async def worker(characteristic, ops):
+    timeouts = 0
+    for _ in range(ops):
+        try:
+            await characteristic.read(timeout_ms=TIMEOUT_MS)
+        except asyncio.TimeoutError:
+            timeouts += 1
+    return timeouts
+
+
+async def run(ops, workers):
+    connection = DeviceConnection(aioble.Device(aioble.ADDR_PUBLIC, "a8:61:0a:00:00:01"))
+    connection._conn_handle = CONN_HANDLE
+    DeviceConnection._connected[CONN_HANDLE] = connection
+    service = ClientService(connection, 0x10, 0xFFFF, bluetooth.UUID(0x181A))
+    characteristics = [ClientCharacteristic(service, 0x11 + 2 * n, 0x12 + 2 * n, 0x02, bluetooth.UUID(0x2A6E)) for n in range(workers)]
+    start = time.perf_counter()
+    timeouts = sum(await asyncio.gather(*[worker(c, ops) for c in characteristics]))
+    return time.perf_counter() - start, timeouts
+
+
+def main():
+    global unanswered
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+    unanswered = 0
+    tasks = [0]
+    uasyncio = sys.modules["uasyncio"]
+    create_task = uasyncio.create_task
+
+    def counted(coro, **kwargs):
+        tasks[0] += 1
+        return create_task(coro, **kwargs)
+
+    uasyncio.create_task = counted
+    ble.handlers["gattc_read"] = gattc_read
+    elapsed, timeouts = asyncio.run(run(ops, workers))
+    print("%d reads by %d tasks in %.2f s" % (ops * workers, workers, elapsed))
+    print("%d unanswered, %d timed out" % (unanswered, timeouts))
+    print("%d tasks created" % tasks[0])
+    if timeouts != unanswered:
+        sys.exit("timeouts don't match the unanswered reads")
+
+
+if __name__ == "__main__":
+    main()
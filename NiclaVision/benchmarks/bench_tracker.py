@@ -0,0 +1,75 @@
+# Replays detection lists through the CentroidTracker and compares its count
+# with the raw number of detections: inferences where each was wrong, how often
+# it changed and the entries and exits the tracker saw.
+#
+# A recording has one JSON list per line, the true count followed by the
+# centroids of that inference, e.g. [2, [[120, 64], [31, 180]]]. Without one
+# people walking around a 240x240 frame are simulated, with a detector missing
+# MISSED of them and adding SPURIOUS detections.
+#
+# Usage: python3 bench_tracker.py [RECORDING]
+
+import json, random, sys, time
+import stubs
+from tracker import CentroidTracker
+
+SIZE = 240
+INFERENCES = 5000
+MISSED = 0.1
+SPURIOUS = 0.05
+JITTER = 4
+
+
+def simulate():
+    random.seed(0)
+    people = []
+    recording = []
+    entries = exits = 0
+    for _ in range(INFERENCES):
+        if len(people) < 5 and random.random() < 0.01:
+            people.append([random.randrange(SIZE), random.randrange(SIZE), random.randrange(30, 300)])
+            entries += 1
+        for person in people:
+            person[0] = min(SIZE - 1, max(0, person[0] + random.randint(-6, 6)))
+            person[1] = min(SIZE - 1, max(0, person[1] + random.randint(-6, 6)))
+            person[2] -= 1
+        exits += sum(1 for person in people if person[2] <= 0)
+        people = [person for person in people if person[2] > 0]
+        centers = [(x + random.randint(-JITTER, JITTER), y + random.randint(-JITTER, JITTER)) for x, y, _ in people if random.random() >= MISSED]
+        if random.random() < SPURIOUS:
+            centers.append((random.randrange(SIZE), random.randrange(SIZE)))
+        recording.append((len(people), centers))
+    return recording, entries, exits
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()], None, None
+
+
+def main():
+    recording, entries, exits = load(sys.argv[1]) if len(sys.argv) > 1 else simulate()
+    tracker = CentroidTracker()
+    wrong = [0, 0]
+    changes = [0, 0]
+    previous = [0, 0]
+    start = time.perf_counter()
+    for truth, centers in recording:
+        counts = (len(centers), tracker.update(centers))
+        for n, count in enumerate(counts):
+            wrong[n] += count != truth
+            changes[n] += count != previous[n]
+            previous[n] = count
+    elapsed = time.perf_counter() - start
+    truth_changes = sum(1 for n in range(1, len(recording)) if recording[n][0] != recording[n - 1][0])
+    print("%d inferences, the true count changed %d times" % (len(recording), truth_changes))
+    print("raw detections: %5d wrong, %5d changes" % (wrong[0], changes[0]))
+    print("tracked:        %5d wrong, %5d changes, %.0f us per update" % (wrong[1], changes[1], elapsed / len(recording) * 1e6))
+    if entries is None:
+        print("%d entries, %d exits" % (tracker.entered, tracker.exited))
+    else:
+        print("%d entries, %d exits, %d and %d simulated" % (tracker.entered, tracker.exited, entries, exits))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Host-side stand-ins for the MicroPython modules aioble imports, so aioble can be
+# loaded and benchmarked with CPython. Import this module before aioble.
+
+import asyncio, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+class _Module:
+    def __init__(self, name, **attributes):
+        self.__name__ = name
+        self.__dict__.update(attributes)
+        sys.modules[name] = self
+
+
+# MicroPython's flag clears itself when a waiter wakes up
+class ThreadSafeFlag(asyncio.Event):
+    async def wait(self):
+        await asyncio.Event.wait(self)
+        self.clear()
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+class UUID:
+    def __init__(self, value):
+        self.value = bytes(value) if isinstance(value, (bytes, bytearray, memoryview)) else value
+
+    def __eq__(self, rhs):
+        return isinstance(rhs, UUID) and self.value == rhs.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return "UUID(%r)" % (self.value,)
+
+    # Little endian like MicroPython's, 16 and 32-bit UUIDs are kept short
+    def __bytes__(self):
+        if isinstance(self.value, bytes):
+            return self.value
+        return self.value.to_bytes(2 if self.value < 0x10000 else 4, "little")
+
+
+# Records every call made to the controller, calls can be answered by setting
+# a handler named after the method, e.g. ble.handlers["gattc_read"] = ...
+class BLE:
+    def __init__(self):
+        self._active = False
+        self._irq = None
+        self.calls = []
+        self.handlers = {}
+
+    def active(self, active=None):
+        if active is not None:
+            self._active = active
+        return self._active
+
+    def irq(self, handler):
+        self._irq = handler
+
+    def config(self, *args, **kwargs):
+        return 0
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            self.calls.append((name, args))
+            handler = self.handlers.get(name)
+            return handler(*args, **kwargs) if handler else None
+
+        return call
+
+
+# MicroPython's tick functions, without the wrap around
+time.ticks_ms = lambda: time.monotonic_ns() // 1000000
+time.ticks_us = lambda: time.monotonic_ns() // 1000
+time.ticks_add = lambda ticks, delta: ticks + delta
+time.ticks_diff = lambda end, start: end - start
+
+_Module("micropython", const=lambda value: value, schedule=lambda function, argument: function(argument))
+_Module("bluetooth", BLE=BLE, UUID=UUID, FLAG_READ=0x02, FLAG_WRITE_NO_RESPONSE=0x04, FLAG_WRITE=0x08, FLAG_NOTIFY=0x10, FLAG_INDICATE=0x20)
+_Module("uasyncio", **dict(vars(asyncio), ThreadSafeFlag=ThreadSafeFlag, sleep_ms=sleep_ms))
+
+
+# Grayscale stand-in for OpenMV's image.Image, with the methods the motion gate
+# uses on the thumbnails
+class GrayImage:
+    def __init__(self, pixels):
+        self.pixels = bytearray(pixels)
+
+    def difference(self, other):
+        self.pixels = bytearray(abs(a - b) for a, b in zip(self.pixels, other.pixels))
+        return self
+
+    def binary(self, thresholds):
+        self.pixels = bytearray(255 if any(low <= p <= high for low, high in thresholds) else 0 for p in self.pixels)
+        return self
+
+    def get_statistics(self):
+        return Statistics(sum(self.pixels) // len(self.pixels))
+
+
+class Statistics:
+    def __init__(self, mean):
+        self._mean = mean
+
+    def mean(self):
+        return self._mean
+
+
+# Sends an event to aioble as the controller would
+def irq(event, data):
+    import aioble.core
+    return aioble.core.ble_irq(event, data)
+
+
+def random_addr(n):
+    return bytes((0xC0 | (n >> 40) & 0x3F, n >> 32 & 0xFF, n >> 24 & 0xFF, n >> 16 & 0xFF, n >> 8 & 0xFF, n & 0xFF))
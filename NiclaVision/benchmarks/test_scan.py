@@ -0,0 +1,67 @@
+# Checks that the content filters of aioble.scan treat the advertising report
+# and the scan response of one device as a whole, with synthetic reports.
+#
+# Usage: python3 -m pytest test_scan.py, or python3 test_scan.py
+
+import asyncio
+import stubs
+import aioble, bluetooth
+
+_IRQ_SCAN_RESULT = 5
+_IRQ_SCAN_DONE = 6
+_ADV_IND = 0
+_ADV_NONCONN_IND = 3
+_SCAN_RSP = 4
+
+ADDR = stubs.random_addr(1)
+OTHER = stubs.random_addr(2)
+# Flags and the environmental sensing service in the report, the name in the response
+ADV = bytes((2, 0x01, 0x06, 3, 0x03, 0x1A, 0x18))
+RSP = bytes((6, 0x09)) + b"NICLA"
+
+
+def report(addr, adv_type, adv_data):
+    stubs.irq(_IRQ_SCAN_RESULT, (0, memoryview(addr), adv_type, -50, memoryview(adv_data)))
+
+
+# Runs a scan over the reports and returns its results by address
+def scan(reports, **filters):
+    async def run():
+        results = {}
+        async with aioble.scan(0, active=True, **filters) as scanner:
+            for addr, adv_type, adv_data in reports:
+                report(addr, adv_type, adv_data)
+            stubs.irq(_IRQ_SCAN_DONE, None)
+            async for result in scanner:
+                results[result.device.addr] = result
+        return results
+
+    return asyncio.run(run())
+
+
+def test_service_filter_keeps_the_name():
+    results = scan([(ADDR, _ADV_IND, ADV), (ADDR, _SCAN_RSP, RSP)], services=[0x181A])
+    assert results[ADDR].name() == "NICLA"
+    assert results[ADDR].connectable
+
+
+def test_name_filter_keeps_the_report():
+    results = scan([(ADDR, _ADV_IND, ADV), (ADDR, _SCAN_RSP, RSP)], name="NICLA")
+    result = results[ADDR]
+    assert result.connectable
+    assert list(result.services()) == [bluetooth.UUID(0x181A)]
+    assert result.name() == "NICLA"
+
+
+def test_other_devices_stay_filtered():
+    reports = [(ADDR, _ADV_IND, ADV), (OTHER, _ADV_IND, bytes((2, 0x01, 0x06))), (OTHER, _SCAN_RSP, bytes((4, 0x09)) + b"abc")]
+    assert list(scan(reports, services=[0x181A])) == [ADDR]
+    # A report that can't be scanned has no response to pass the filter for it
+    assert scan([(OTHER, _ADV_NONCONN_IND, ADV), (OTHER, _SCAN_RSP, RSP)], name="NICLA")[OTHER].adv_data is None
+
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("ok", name)
@@ -0,0 +1,121 @@
+# Checks the motion gate and the inference scheduler on synthetic frame
+# sequences, with stand-in images for OpenMV's.
+#
+# Usage: python3 -m pytest test_scheduler.py, or python3 test_scheduler.py
+
+import random
+import stubs
+from scheduler import MotionGate, InferenceScheduler
+
+SIZE = 30
+
+
+# A noisy gradient, with a bright 4x8 blob at column x when x is given
+def frame(x=None, seed=0):
+    rng = random.Random(seed)
+    pixels = bytearray(min(255, max(0, 40 + (i % SIZE) * 3 + (i // SIZE) * 2 + int(rng.gauss(0, 3)))) for i in range(SIZE * SIZE))
+    if x is not None:
+        for row in range(10, 18):
+            for column in range(x, min(x + 4, SIZE)):
+                pixels[row * SIZE + column] = min(255, pixels[row * SIZE + column] + 60)
+    return stubs.GrayImage(pixels)
+
+
+def still(n, x=None):
+    return [frame(x, seed) for seed in range(n)]
+
+
+def test_first_frame_is_motion():
+    assert MotionGate().update(frame())
+
+
+def test_noise_is_not_motion():
+    gate = MotionGate()
+    results = [gate.update(f) for f in still(20)]
+    assert results[0] and not any(results[1:])
+
+
+def test_still_person_is_not_motion():
+    gate = MotionGate()
+    results = [gate.update(f) for f in still(20, x=12)]
+    assert results[0] and not any(results[1:])
+
+
+def test_walking_person_is_motion():
+    gate = MotionGate()
+    gate.update(frame())
+    assert all(gate.update(frame(x, seed=x)) for x in range(0, 24, 4))
+    assert gate.score >= gate.motion_threshold
+
+
+def test_thresholds():
+    gate = MotionGate(motion_threshold=255)
+    gate.update(frame())
+    assert not gate.update(frame(12))
+
+
+# Runs the scheduler over frames taken at its own pace, detecting count(now)
+def run(scheduler, frame_at, count_at, until_ms):
+    now = 0
+    snapshots = []
+    while now < until_ms:
+        detect = scheduler.should_detect(frame_at(now), now)
+        if detect:
+            scheduler.detected(count_at(now), now)
+        delay = scheduler.delay_ms(now)
+        snapshots.append((now, detect, delay))
+        now += delay
+    return snapshots
+
+
+def test_empty_room_backs_off():
+    scheduler = InferenceScheduler(MotionGate())
+    snapshots = run(scheduler, lambda now: frame(seed=now), lambda now: 0, 100000)
+    delays = [delay for _, _, delay in snapshots]
+    assert delays[-1] == scheduler.idle_ms
+    assert delays == sorted(delays[: delays.index(scheduler.idle_ms)]) + delays[delays.index(scheduler.idle_ms) :]
+    # The first frame, the one settling it and one refresh a minute later
+    assert scheduler.detections == 3
+
+
+def test_occupied_still_room_checks_without_inference():
+    scheduler = InferenceScheduler(MotionGate(), hold_ms=2000)
+    snapshots = run(scheduler, lambda now: frame(12, seed=now), lambda now: 1, 30000)
+    later = [(detect, delay) for now, detect, delay in snapshots if now > 5000]
+    assert later and all(delay == scheduler.check_ms for _, delay in later)
+    assert not any(detect for detect, _ in later)
+
+
+def test_motion_speeds_up_and_detects():
+    scheduler = InferenceScheduler(MotionGate())
+    enters = 30000
+
+    def frame_at(now):
+        if now < enters:
+            return frame(seed=now)
+        return frame(min(12, (now - enters) // 500), seed=now)
+
+    snapshots = run(scheduler, frame_at, lambda now: int(now >= enters), 60000)
+    first = next(now for now, detect, _ in snapshots if now >= enters and detect)
+    assert first - enters <= scheduler.idle_ms
+    assert scheduler.count == 1
+    walking = [delay for now, _, delay in snapshots if first <= now < enters + 6000]
+    assert walking and all(delay == scheduler.active_ms for delay in walking)
+
+
+def test_unsettled_count_keeps_detecting():
+    scheduler = InferenceScheduler(MotionGate())
+    scheduler.should_detect(frame(), 0)
+    scheduler.detected(0, 0)
+    assert scheduler.should_detect(frame(seed=1), 100)
+    scheduler.detected(0, 100, settled=False)
+    assert scheduler.should_detect(frame(seed=2), 200)
+    scheduler.detected(0, 200)
+    assert not scheduler.should_detect(frame(seed=3), 300)
+
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("ok", name)
@@ -12,6 +12,9 @@ import bluetooth
 import random
 import struct
 
+from scheduler import MotionGate, InferenceScheduler
+from tracker import CentroidTracker
+
 sensor.reset()                         # Reset and initialize the sensor.
 sensor.set_pixformat(sensor.RGB565)    # Set pixel format to RGB565 (or GRAYSCALE)
 sensor.set_framesize(sensor.QVGA)      # Set frame size to QVGA (320x240)
@@ -25,6 +28,16 @@ net = None
 labels = None
 min_confidence = 0.5
 
+# Skip the drawing and printing only useful with the OpenMV IDE attached.
+headless = False
+
+if headless:
+    try:
+        import omv
+        omv.disable_fb(True)           # Don't copy frames out for the IDE either.
+    except (ImportError, AttributeError):
+        pass
+
 try:
     # load the model, alloc the model file on the heap if we have at least 64K free after loading
     net = tf.load("trained.tflite", load_to_fb=uos.stat('trained.tflite')[6] > (gc.mem_free() - (64*1024)))
@@ -53,11 +66,31 @@ _ADV_APPEARANCE_GENERIC_COMPUTER = const(768)
 # How frequently to send advertising beacons.
 _ADV_INTERVAL_MS = 500_000
 
+# How many centrals can be connected at the same time.
+_MAX_CONNECTIONS = const(3)
+
+# Notify the count when it moves by more than the deadband, at most once per
+# minimum interval, and as a heartbeat when it doesn't change for a while.
+_COUNT_DEADBAND = const(0)
+_NOTIFY_MIN_INTERVAL_MS = const(1000)
+_HEARTBEAT_MS = const(300_000)
+
+# The motion gate compares 30x30 grayscale thumbnails of the 240x240 window.
+_THUMB_SCALE = 0.125
+
+# How frequently to update the stats characteristic.
+_STATS_INTERVAL_MS = const(10_000)
+
+_STATS_UUID = bluetooth.UUID("5c1d0a3e-7b2f-4e61-9a8d-3f0e6c4b2a10")
+
 
 # Register GATT server.
 peoplecount_service = aioble.Service(_GEN_ATTR_UUID)
 peoplecount_characteristic = aioble.Characteristic(
-    peoplecount_service, _GEN_ATTR_UNITLESS_UUID, read=True, notify=False
+    peoplecount_service, _GEN_ATTR_UNITLESS_UUID, read=True, notify=True, indicate=True
+)
+stats_characteristic = aioble.Characteristic(
+    peoplecount_service, _STATS_UUID, read=True
 )
 aioble.register_services(peoplecount_service)
 
@@ -67,54 +100,162 @@ def _encode_peoplecount(peoplecount):
     return struct.pack("<i", int(peoplecount))
 
 
-# This would be periodically polling a hardware sensor.
+# Helper to encode the stats characteristic: inferences and snapshots per second
+# times 100, then the average snapshot, detect, post-process and BLE write times
+# in microseconds, 20 bytes to fit in one notification at the default MTU.
+def _encode_stats(elapsed_ms, snapshots, inferences, stage_us):
+    per_inference = max(inferences, 1)
+    return struct.pack(
+        "<HHIIII",
+        min(inferences * 100_000 // elapsed_ms, 0xFFFF),
+        min(snapshots * 100_000 // elapsed_ms, 0xFFFF),
+        stage_us[0] // max(snapshots, 1),
+        stage_us[1] // per_inference,
+        stage_us[2] // per_inference,
+        stage_us[3] // per_inference,
+    )
+
+
+peoplecount = 0
+peoplecount_changed = asyncio.Event()
+
+
+# Update the value read by centrals, and wake up notify_task if it changed.
+def publish_peoplecount(count):
+    global peoplecount
+    peoplecount_characteristic.write(_encode_peoplecount(count))
+    if count != peoplecount:
+        peoplecount = count
+        peoplecount_changed.set()
+
+
+# Notify the subscribed centrals of changes instead of having them poll, so a
+# stable room costs no traffic but the heartbeat.
+async def notify_task():
+    notified = None
+    notified_at = time.ticks_ms()
+    while True:
+        timeout = _HEARTBEAT_MS - time.ticks_diff(time.ticks_ms(), notified_at)
+        try:
+            await asyncio.wait_for_ms(peoplecount_changed.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        peoplecount_changed.clear()
+        heartbeat = time.ticks_diff(time.ticks_ms(), notified_at) >= _HEARTBEAT_MS
+        if not heartbeat and notified is not None and abs(peoplecount - notified) <= _COUNT_DEADBAND:
+            continue
+        await asyncio.sleep_ms(max(_NOTIFY_MIN_INTERVAL_MS - time.ticks_diff(time.ticks_ms(), notified_at), 0))
+        notified = peoplecount
+        notified_at = time.ticks_ms()
+        peoplecount_characteristic.notify_all(_encode_peoplecount(notified))
+
+
+# Take a snapshot whenever the scheduler says so, and only run inference on it
+# when the motion gate saw a change or the count needs refreshing.
 async def sensor_task():
-    t = 24.5
+    thresholds = [(math.ceil(min_confidence * 255), 255)]
+    scheduler = InferenceScheduler(MotionGate())
+    tracker = CentroidTracker()
+    stats_at = time.ticks_ms()
+    stage_us = [0, 0, 0, 0]
+    snapshots = 0
+    inferences = 0
     while True:
+        start = time.ticks_us()
         img = sensor.snapshot()
+        thumb = img.to_grayscale(x_scale=_THUMB_SCALE, y_scale=_THUMB_SCALE, copy=True)
+        stage_us[0] += time.ticks_diff(time.ticks_us(), start)
+        snapshots += 1
+
+        if scheduler.should_detect(thumb, time.ticks_ms()):
+            start = time.ticks_us()
+            detections = net.detect(img, thresholds=thresholds)
+            stage_us[1] += time.ticks_diff(time.ticks_us(), start)
+
+            # detect() returns all objects found in the image (splitted out per class already)
+            # we skip class index 0, as that is the background, and then draw circles of the center
+            # of our objects
+
+            start = time.ticks_us()
+            centers = []
+            for i, detection_list in enumerate(detections):
+                if (i == 0): continue # background class
+                if (len(detection_list) == 0): continue # no detections for this class?
+
+                if not headless: print("********** %s **********" % labels[i])
+                for d in detection_list:
+                    [x, y, w, h] = d.rect()
+                    center_x = math.floor(x + (w / 2))
+                    center_y = math.floor(y + (h / 2))
+                    if not headless:
+                        print('x %d\ty %d' % (center_x, center_y))
+                        img.draw_circle((center_x, center_y, 12), color=colors[i], thickness=2)
+                    centers.append((center_x, center_y))
+
+            # Count the tracked people rather than this frame's detections
+            count = tracker.update(centers)
+            if not headless:
+                for event, track in tracker.events:
+                    print(event, track)
+                print(count)
+            scheduler.detected(count, time.ticks_ms(), tracker.settled)
+            stage_us[2] += time.ticks_diff(time.ticks_us(), start)
+
+            start = time.ticks_us()
+            publish_peoplecount(count)
+            stage_us[3] += time.ticks_diff(time.ticks_us(), start)
+            inferences += 1
+
+        elapsed = time.ticks_diff(time.ticks_ms(), stats_at)
+        if elapsed >= _STATS_INTERVAL_MS:
+            stats_characteristic.write(_encode_stats(elapsed, snapshots, inferences, stage_us))
+            stats_at = time.ticks_ms()
+            stage_us = [0, 0, 0, 0]
+            snapshots = 0
+            inferences = 0
+
+        await asyncio.sleep_ms(scheduler.delay_ms(time.ticks_ms()))
 
-        # detect() returns all objects found in the image (splitted out per class already)
-        # we skip class index 0, as that is the background, and then draw circles of the center
-        # of our objects
 
-        count = 0
-        for i, detection_list in enumerate(net.detect(img, thresholds=[(math.ceil(min_confidence * 255), 255)])):
-            if (i == 0): continue # background class
-            if (len(detection_list) == 0): continue # no detections for this class?
+connections = []
+slot_free = asyncio.Event()
 
-            print("********** %s **********" % labels[i])
-            for d in detection_list:
-                [x, y, w, h] = d.rect()
-                center_x = math.floor(x + (w / 2))
-                center_y = math.floor(y + (h / 2))
-                print('x %d\ty %d' % (center_x, center_y))
-                img.draw_circle((center_x, center_y, 12), color=colors[i], thickness=2)
-                count = count + 1
 
-        peoplecount_characteristic.write(_encode_peoplecount(count))
-        print(count)
-        await asyncio.sleep_ms(5000)
+# Serve one central for as long as it stays connected, so subscribed gateways
+# keep getting notifications without reconnecting.
+async def connection_task(connection):
+    if not headless: print("Connection from", connection.device)
+    try:
+        async with connection:
+            await connection.disconnected(timeout_ms=None)
+    finally:
+        connections.remove(connection)
+        slot_free.set()
 
 
-# Serially wait for connections. Don't advertise while a central is
-# connected.
+# Keep advertising while centrals are connected so several gateways can read
+# the count at once, until all the connection slots are taken.
 async def peripheral_task():
     while True:
-        async with await peripheral.advertise(
+        while len(connections) >= _MAX_CONNECTIONS:
+            slot_free.clear()
+            await slot_free.wait()
+        connection = await peripheral.advertise(
             _ADV_INTERVAL_MS,
             name="NICLA-VISION",
             services=[_GEN_ATTR_UUID],
             appearance=_ADV_APPEARANCE_GENERIC_COMPUTER,
-        ) as connection:
-            print("Connection from", connection.device)
-            await connection.disconnected()
+        )
+        connections.append(connection)
+        asyncio.create_task(connection_task(connection))
 
 
-# Run both tasks.
+# Run all the tasks.
 async def mainBLE():
     t1 = asyncio.create_task(sensor_task())
     t2 = asyncio.create_task(peripheral_task())
-    await asyncio.gather(t1, t2)
+    t3 = asyncio.create_task(notify_task())
+    await asyncio.gather(t1, t2, t3)
 
 while (True):
     asyncio.run(mainBLE())
@@ -0,0 +1,93 @@
+# Decides when the detection loop runs inference. A motion gate compares small
+# grayscale frames so net.detect() only runs when the scene changes, the
+# snapshot rate goes up while people come and go and backs off when the room
+# is empty. Nothing here touches the camera, so it also runs on a host with
+# stand-ins for the images.
+
+try:
+    from time import ticks_diff
+except ImportError:
+    def ticks_diff(end, start):
+        return end - start
+
+
+# Compares each grayscale thumbnail with the previous one with the image's own
+# difference(), binary() and get_statistics(), which run in C on the board. The
+# score is the fraction of pixels that changed by pixel_threshold or more, in
+# 1/255 units, there's motion from motion_threshold on. The previous thumbnail
+# is overwritten, so every update needs a new one.
+class MotionGate:
+    def __init__(self, pixel_threshold=24, motion_threshold=4):
+        self.pixel_threshold = pixel_threshold
+        self.motion_threshold = motion_threshold
+        self.score = 0
+        self._previous = None
+
+    def update(self, frame):
+        previous = self._previous
+        self._previous = frame
+        if previous is None:
+            return True
+        previous.difference(frame)
+        previous.binary([(self.pixel_threshold, 255)])
+        self.score = previous.get_statistics().mean()
+        return self.score >= self.motion_threshold
+
+
+# Feed it every snapshot with should_detect(), report the count of each
+# inference with detected() and sleep for delay_ms() before the next snapshot.
+# A count that isn't settled yet, e.g. in a tracker, is handled like a change.
+# Inference runs on the frames with motion and on the first still frame after
+# them, to settle the count. Motion or a changed count keeps the loop at
+# active_ms for hold_ms, then it checks every check_ms while the room is
+# occupied and backs off to idle_ms when it's empty. Inference also runs every
+# refresh_ms, for the people sitting still enough not to be seen by the gate.
+class InferenceScheduler:
+    def __init__(self, gate, active_ms=500, check_ms=1000, idle_ms=4000, hold_ms=10000, refresh_ms=60000):
+        self.gate = gate
+        self.active_ms = active_ms
+        self.check_ms = check_ms
+        self.idle_ms = idle_ms
+        self.hold_ms = hold_ms
+        self.refresh_ms = refresh_ms
+        self.count = 0
+        self.detections = 0
+        self.skipped = 0
+        self._active_at = None
+        self._detected_at = None
+        self._settled = False
+        self._backoff = check_ms
+
+    def _active(self, now):
+        return self._active_at is not None and ticks_diff(now, self._active_at) < self.hold_ms
+
+    def should_detect(self, frame, now):
+        if self.gate.update(frame):
+            self._active_at = now
+            self._settled = False
+            return True
+        if not self._settled:
+            self._settled = True
+            return True
+        if ticks_diff(now, self._detected_at) >= self.refresh_ms:
+            return True
+        self.skipped += 1
+        return False
+
+    def detected(self, count, now, settled=True):
+        if count != self.count or not settled:
+            self._active_at = now
+            self._settled = False
+        self.count = count
+        self.detections += 1
+        self._detected_at = now
+
+    def delay_ms(self, now):
+        if self._active(now):
+            self._backoff = self.check_ms
+            return self.active_ms
+        if self.count:
+            return self.check_ms
+        delay = self._backoff
+        self._backoff = min(delay * 2, self.idle_ms)
+        return delay
@@ -0,0 +1,95 @@
+# Follows people from one inference to the next by the centroids of their
+# detections, so a single missed or spurious detection doesn't change the count
+# and people coming in and leaving show up as entry and exit events. Memory is
+# bounded by max_tracks, and nothing here touches the camera, so it also runs on
+# a host.
+
+
+# Each inference's centroids are matched greedily to the nearest track within
+# max_distance pixels. A new track counts once it has been seen confirm times in
+# a row, and a counted track is dropped after max_missed inferences without it.
+# The count is the median of the counted tracks over the last window inferences.
+class CentroidTracker:
+    def __init__(self, max_tracks=16, max_distance=40, confirm=2, max_missed=2, window=3):
+        self.max_tracks = max_tracks
+        self.max_distance = max_distance
+        self.confirm = confirm
+        self.max_missed = max_missed
+        self.count = 0
+        self.entered = 0
+        self.exited = 0
+        # (event, track id) of the last update, event being "enter" or "exit"
+        self.events = []
+        # [id, x, y, age, hits, missed]
+        self.tracks = []
+        self._next_id = 1
+        self._counts = [0] * window
+        self._index = 0
+
+    # The count has settled when every track is counted and was seen in the
+    # last inference, and the median window agrees with it
+    @property
+    def settled(self):
+        for track in self.tracks:
+            if track[4] < self.confirm or track[5]:
+                return False
+        for count in self._counts:
+            if count != self.count:
+                return False
+        return True
+
+    def update(self, centers):
+        events = self.events
+        del events[:]
+        tracks = self.tracks
+        centers = centers[: self.max_tracks]
+        limit = self.max_distance * self.max_distance
+        pairs = []
+        for t, track in enumerate(tracks):
+            for d, (x, y) in enumerate(centers):
+                distance = (x - track[1]) * (x - track[1]) + (y - track[2]) * (y - track[2])
+                if distance <= limit:
+                    pairs.append((distance, t, d))
+        pairs.sort()
+        matched_tracks = 0
+        matched_centers = 0
+        for distance, t, d in pairs:
+            if (matched_tracks >> t) & 1 or (matched_centers >> d) & 1:
+                continue
+            matched_tracks |= 1 << t
+            matched_centers |= 1 << d
+            track = tracks[t]
+            track[1], track[2] = centers[d]
+            track[4] += 1
+            track[5] = 0
+            if track[4] == self.confirm:
+                self.entered += 1
+                events.append(("enter", track[0]))
+        kept = []
+        for t, track in enumerate(tracks):
+            track[3] += 1
+            if not (matched_tracks >> t) & 1:
+                if track[4] < self.confirm:
+                    continue
+                track[5] += 1
+                if track[5] > self.max_missed:
+                    self.exited += 1
+                    events.append(("exit", track[0]))
+                    continue
+            kept.append(track)
+        for d, (x, y) in enumerate(centers):
+            if not (matched_centers >> d) & 1 and len(kept) < self.max_tracks:
+                kept.append([self._next_id, x, y, 0, 1, 0])
+                self._next_id += 1
+                if self.confirm <= 1:
+                    self.entered += 1
+                    events.append(("enter", kept[-1][0]))
+        self.tracks = kept
+        counted = 0
+        for track in kept:
+            if track[4] >= self.confirm:
+                counted += 1
+        self._counts[self._index] = counted
+        self._index = (self._index + 1) % len(self._counts)
+        self.count = sorted(self._counts)[len(self._counts) // 2]
+        return self.count
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+#Decodes PAYLOADS characteristic payloads with the original hex round trip and
+#struct.unpack('f') and with the Decoder of each characteristic, plain and
+#scaled, and reports the time per payload of each path.
+#
+#Usage: python3 bench_decoders.py [PAYLOADS]
+
+import binascii, os, random, struct, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from decoders import Decoder
+
+
+#The decoding blescanner.py did before the Decoder tables
+def old_decode(data):
+    val = binascii.b2a_hex(data)
+    val = binascii.unhexlify(val)
+    return struct.unpack('f', val)[0]
+
+
+def run(name, decode, payloads):
+    start = time.perf_counter()
+    for data in payloads:
+        decode(data)
+    elapsed = time.perf_counter() - start
+    print("%-16s %6.3f s, %5.0f ns/payload" % (name, elapsed, elapsed / len(payloads) * 1e9))
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    random.seed(0)
+    #A few thousand distinct payloads, like the readings of a day repeat
+    distinct = [struct.pack("<f", random.uniform(15, 30)) for _ in range(4096)]
+    payloads = [distinct[n % len(distinct)] for n in range(count)]
+    float32 = Decoder("float32")
+    scaled = Decoder("float32", scale=1.8, offset=32)
+    for data in distinct[:16]:
+        if old_decode(data) != float32.decode(data):
+            sys.exit("decoders disagree on %r" % data)
+    print("%d float32 payloads" % count)
+    old = run("hex round trip", old_decode, payloads)
+    new = run("Decoder", float32.decode, payloads)
+    run("Decoder scaled", scaled.decode, payloads)
+    print("Decoder is %.1fx faster" % (old / new))
+
+
+if __name__ == "__main__":
+    main()
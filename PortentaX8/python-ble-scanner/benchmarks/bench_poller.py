@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+#Runs the Poller over fake peripherals whose reads take LATENCIES seconds, with
+#a sampling period shorter than any of them, until every device has been read
+#CYCLES times. Checks that this takes about CYCLES times the slowest latency, as
+#the devices are polled concurrently, and not the sum of all latencies.
+#
+#Usage: python3 bench_poller.py [CYCLES]
+
+import sys, time
+from fakeperipheral import FakeNetwork, device
+from connection import Backoff
+from poller import Poller
+
+LATENCIES = (0.01, 0.02, 0.05, 0.1, 0.2)
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    devices = [device("device%d" % n, period=0.001) for n in range(len(LATENCIES))]
+    network = FakeNetwork(latencies=dict((d.name, latency) for d, latency in zip(devices, LATENCIES)))
+    poller = Poller(devices, network.connect, network.read, network.sink, Backoff())
+    start = time.monotonic()
+    poller.start()
+    while min(network.count(d.name) for d in devices) < cycles:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    poller.stop()
+    slowest = cycles * max(LATENCIES)
+    total = cycles * sum(LATENCIES)
+    print("%d devices, %d cycles in %.2f s, %.3f s per cycle" % (len(devices), cycles, elapsed, elapsed / cycles))
+    print("slowest device alone %.2f s, all devices in turn %.2f s" % (slowest, total))
+    for d, latency in zip(devices, LATENCIES):
+        print("  %s: %.0f ms reads, %d readings" % (d.name, latency * 1000, network.count(d.name)))
+    if elapsed > slowest * 1.25 + 0.1:
+        sys.exit("a cycle took %.3f s, the slowest device only needs %.3f s" % (elapsed / cycles, max(LATENCIES)))
+    if network.count(devices[0].name) < cycles * max(LATENCIES) / LATENCIES[0] / 2:
+        sys.exit("the fastest device was held back by the slower ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+#Runs the Poller for DURATION seconds over three fake peripherals: one keeping
+#its link, one dropping it every few reads and one accepting connections but
+#failing the first read every time, and reports the connection health of each.
+#Checks that the stable device stays fully available, that the dropping one
+#reconnects after the initial delay every time, and that the backoff of the
+#failing one grows to its maximum, as it never gets through a poll.
+#
+#Usage: python3 bench_reconnect.py [DURATION]
+
+import sys, time
+from fakeperipheral import FakeNetwork, device
+from connection import Backoff
+from poller import Poller
+
+PERIOD = 0.01
+BACKOFF = Backoff(initial=0.02, maximum=0.32, jitter=0)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    devices = [device("stable", PERIOD), device("dropping", PERIOD), device("failing", PERIOD)]
+    network = FakeNetwork(latencies={"stable": 0.005, "dropping": 0.005}, reads_per_link={"dropping": 5, "failing": 0})
+    poller = Poller(devices, network.connect, network.read, network.sink, BACKOFF)
+    poller.start()
+    time.sleep(duration)
+    health = poller.health()
+    poller.stop()
+    for d in devices:
+        h = health[d.name]
+        connects = network.connects[d.name]
+        gaps = [b - a for a, b in zip(connects, connects[1:])]
+        print("%-8s %3d connects, %3d reconnects, %4d readings, %5.1f%% available, longest gap %.2f s" % (
+            d.name, len(connects), h.reconnects, network.count(d.name), h.availability() * 100, max(gaps or [0])))
+    if health["stable"].reconnects or health["stable"].availability() < 0.99:
+        sys.exit("the stable device was affected by the others")
+    gaps = [b - a for a, b in zip(network.connects["dropping"], network.connects["dropping"][1:])]
+    if not gaps or max(gaps) > BACKOFF.initial * 2 + 5 * PERIOD + 0.05:
+        sys.exit("a link that got through polls backed off further than the initial delay")
+    gaps = [b - a for a, b in zip(network.connects["failing"], network.connects["failing"][1:])]
+    if max(gaps or [0]) < BACKOFF.maximum * 0.9:
+        sys.exit("a link failing on its first read never backed off to %.2f s" % BACKOFF.maximum)
+
+
+if __name__ == "__main__":
+    main()
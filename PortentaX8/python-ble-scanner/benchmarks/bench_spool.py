@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+#Runs the InfluxWriter with a Spool against a local stand-in of the write
+#endpoint: while the stand-in answers 503, POINTS points are written and end up
+#in the spool, then it recovers and the time until the backlog is replayed is
+#reported. Checks that every point arrived once, in no more requests than the
+#spool has chunks, that a spool failing to append drops its batches without
+#stopping the writer thread and that batches refused with a 422 are skipped.
+#
+#Usage: python3 bench_spool.py [POINTS]
+
+import os, sys, tempfile, time
+from fakeinflux import FakeInflux
+from influxdb_client import Point
+from influxwriter import InfluxWriter
+from spool import Spool
+
+BATCH_SIZE = 500
+RETRY_INTERVAL = 0.2
+
+
+def produce(writer, points, offset=0):
+    for n in range(points):
+        writer.write(Point("nicla_sense").tag("location", "room %d" % (n % 4)).field("temperature", 21.5 + n % 10).time(offset + n))
+
+
+def wait(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def replay(points):
+    with FakeInflux() as fake, tempfile.TemporaryDirectory() as directory:
+        fake.failing = 503
+        spool = Spool(directory)
+        with InfluxWriter(fake.url, "token", "org", "bucket", batch_size=BATCH_SIZE, spool=spool, retry_interval=RETRY_INTERVAL) as writer:
+            start = time.perf_counter()
+            produce(writer, points)
+            writer.flush()
+            if not wait(lambda: spool.segments() and not writer.queue.qsize(), 60):
+                sys.exit("the spool stayed empty while the database was down")
+            spooled = time.perf_counter() - start
+            size = sum(os.path.getsize(path) for path in spool.segments())
+            failed = fake.requests
+            fake.failing = None
+            start = time.perf_counter()
+            if not wait(lambda: fake.points() >= points, 60):
+                sys.exit("%d of %d spooled points replayed" % (fake.points(), points))
+            replayed = time.perf_counter() - start
+        print("%d points spooled in %.2f s, %.1f MB after %d failed requests" % (points, spooled, size / 1e6, failed))
+        print("replayed in %d requests, %.2f s after recovery, %.0f points/s" % (len(fake.batches), replayed, points / replayed))
+        if fake.points() != points:
+            sys.exit("%d of %d points arrived" % (fake.points(), points))
+        if spool.segments():
+            sys.exit("segments left after the replay: %r" % spool.segments())
+
+
+class FullSpool(Spool):
+    def append(self, lines):
+        raise OSError(28, "No space left on device")
+
+
+#A spool that cannot take a batch loses it, but later points still get written
+def check_full_spool():
+    with FakeInflux() as fake, tempfile.TemporaryDirectory() as directory:
+        fake.failing = 503
+        with InfluxWriter(fake.url, "token", "org", "bucket", batch_size=BATCH_SIZE, spool=FullSpool(directory), retry_interval=RETRY_INTERVAL) as writer:
+            produce(writer, BATCH_SIZE * 2)
+            if not wait(lambda: writer.dropped == BATCH_SIZE * 2, 10):
+                sys.exit("%d of %d points counted as dropped" % (writer.dropped, BATCH_SIZE * 2))
+            fake.failing = None
+            produce(writer, 10, BATCH_SIZE * 2)
+            writer.flush()
+            if not wait(lambda: fake.points() == 10, 10):
+                sys.exit("%d of 10 points arrived after the spool failed" % fake.points())
+            if not writer.thread.is_alive():
+                sys.exit("the writer thread died")
+    print("full spool: %d points dropped, the writer kept running" % writer.dropped)
+
+
+#A batch InfluxDB refuses for its content, like a field type conflict, is
+#dropped instead of spooled, and a spooled one is skipped on replay, so
+#neither holds up the readings behind it
+def check_rejected():
+    with FakeInflux() as fake, tempfile.TemporaryDirectory() as directory:
+        spool = Spool(directory)
+        with InfluxWriter(fake.url, "token", "org", "bucket", batch_size=BATCH_SIZE, spool=spool, retry_interval=RETRY_INTERVAL) as writer:
+            fake.failing = 422
+            produce(writer, BATCH_SIZE)
+            writer.flush()
+            if not wait(lambda: fake.requests == 1 and not writer.queue.qsize(), 10):
+                sys.exit("the rejected batch was not written")
+            if spool.pending():
+                sys.exit("a rejected batch was spooled")
+            fake.failing = 503
+            produce(writer, BATCH_SIZE, BATCH_SIZE)
+            writer.flush()
+            if not wait(lambda: spool.pending() and not writer.queue.qsize(), 10):
+                sys.exit("the spool stayed empty while the database was down")
+            fake.failing = 422
+            if not wait(lambda: not spool.pending(), 10):
+                sys.exit("the spool kept a batch the database rejects")
+            fake.failing = None
+            produce(writer, 10, BATCH_SIZE * 2)
+            writer.flush()
+            if not wait(lambda: fake.points() == 10, 10):
+                sys.exit("%d of 10 points arrived after a rejected batch" % fake.points())
+    print("rejected batches: dropped and skipped on replay, later points written")
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    check_full_spool()
+    check_rejected()
+    replay(points)
+
+
+if __name__ == "__main__":
+    main()
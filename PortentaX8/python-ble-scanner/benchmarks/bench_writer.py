@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+#Runs the InfluxWriter against a local stand-in of the write endpoint answering
+#after LATENCY_MS: PRODUCERS threads write POINTS points in total, once with
+#batch_size=1, which is one request per point like the writes before the
+#batching writer, and once with the default batching. Checks that every point
+#arrived, that no batch is larger than batch_size and that only the batches cut
+#by the flush interval or the final flush are smaller, and that a few points
+#are written within the flush interval.
+#
+#Usage: python3 bench_writer.py [POINTS] [PRODUCERS]
+
+import sys, threading, time
+from fakeinflux import FakeInflux
+from influxdb_client import Point
+from influxwriter import InfluxWriter
+
+LATENCY_MS = 2
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.2
+
+
+def produce(writer, points, offset):
+    for n in range(points):
+        writer.write(Point("nicla_sense").tag("location", "room %d" % (offset % 4)).field("temperature", 21.5 + n % 10).time(offset * points + n))
+
+
+def run(points, producers, batch_size):
+    with FakeInflux(latency=LATENCY_MS / 1000) as fake:
+        start = time.perf_counter()
+        with InfluxWriter(fake.url, "token", "org", "bucket", batch_size=batch_size, flush_interval=FLUSH_INTERVAL) as writer:
+            threads = [threading.Thread(target=produce, args=(writer, points // producers, n)) for n in range(producers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+    written = points // producers * producers
+    print("batch_size %3d: %6d points in %5d requests, %5.2f s, %7.0f points/s" % (batch_size, fake.points(), fake.requests, elapsed, written / elapsed))
+    if fake.points() != written:
+        sys.exit("%d of %d points arrived" % (fake.points(), written))
+    if max(fake.batches) > batch_size:
+        sys.exit("a batch of %d points, more than %d" % (max(fake.batches), batch_size))
+    return fake.batches, elapsed
+
+
+#A trickle of points smaller than a batch still goes out within the flush interval
+def check_interval():
+    with FakeInflux() as fake:
+        with InfluxWriter(fake.url, "token", "org", "bucket", batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL) as writer:
+            produce(writer, 10, 0)
+            time.sleep(FLUSH_INTERVAL * 2)
+            if fake.batches != [10]:
+                sys.exit("10 points after the flush interval arrived as %r" % fake.batches)
+    print("10 points flushed after %.1f s in one batch" % FLUSH_INTERVAL)
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    producers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print("%d ms per request" % LATENCY_MS)
+    check_interval()
+    run(min(points, 2000), producers, 1)
+    batches, batched = run(points, producers, BATCH_SIZE)
+    #Producers outrun the writer, so short batches come only from the interval and the final flush
+    short = sum(1 for size in batches if size < BATCH_SIZE)
+    print("%d full batches, %d short" % (len(batches) - short, short))
+    if short > 1 + batched / FLUSH_INTERVAL:
+        sys.exit("%d short batches in %.2f s" % (short, batched))
+
+
+if __name__ == "__main__":
+    main()
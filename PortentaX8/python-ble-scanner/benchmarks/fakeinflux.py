@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+#Local stand-in for the InfluxDB v2 write endpoint, so the writer can be run and
+#checked without a database. Every accepted POST to /api/v2/write is recorded
+#with its line count, and the server can be told to fail or to answer slowly.
+
+import os, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+class FakeInflux:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        #HTTP status to answer writes with instead of 204, None to accept them
+        self.failing = None
+        self.batches = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake.lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if not self.path.startswith("/api/v2/write") or fake.failing:
+                    self.send_response(fake.failing or 404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                lines = [line for line in data.split(b"\n") if line]
+                with fake.lock:
+                    fake.batches.append(len(lines))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def points(self):
+        with self.lock:
+            return sum(self.batches)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_traceback):
+        self.server.shutdown()
+        self.server.server_close()
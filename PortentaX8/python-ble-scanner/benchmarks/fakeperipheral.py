@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+#Stand-in for a bluepy Peripheral, so the poller can be run and checked without
+#Bluetooth: every read takes latency seconds and the link can be made to drop
+#after a number of reads, or to fail on the first read after every connect.
+
+import os, sys, threading, time, types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+try:
+    from bluepy.btle import BTLEException
+except ImportError:
+    #bluepy only builds on Linux with BlueZ, the poller only needs its exception
+    class BTLEException(Exception):
+        pass
+    btle = types.ModuleType("bluepy.btle")
+    btle.BTLEException = BTLEException
+    sys.modules["bluepy"] = types.ModuleType("bluepy")
+    sys.modules["bluepy.btle"] = btle
+
+from poller import PolledDevice
+
+
+class FakePeripheral:
+    def __init__(self, device, latency=0.0, reads_per_link=None):
+        self.device = device
+        self.latency = latency
+        #Reads served before the link drops, None to keep it up, 0 to fail the first one
+        self.reads_per_link = reads_per_link
+        self.reads = 0
+        self.connected = True
+
+    def read(self):
+        if not self.connected:
+            raise BTLEException("not connected")
+        if self.reads_per_link is not None and self.reads >= self.reads_per_link:
+            self.connected = False
+            raise BTLEException("link dropped")
+        time.sleep(self.latency)
+        self.reads += 1
+        return dict((label, float(self.reads)) for label in self.device.labels)
+
+    def waitForNotifications(self, timeout):
+        time.sleep(timeout)
+        return False
+
+    def disconnect(self):
+        self.connected = False
+
+
+#connect, read and sink callables for Poller over fake peripherals, recording
+#the connections and readings of every device
+class FakeNetwork:
+    def __init__(self, latencies=None, reads_per_link=None):
+        self.latencies = latencies or {}
+        self.reads_per_link = reads_per_link or {}
+        self.lock = threading.Lock()
+        self.connects = {}
+        self.readings = {}
+
+    def connect(self, device):
+        with self.lock:
+            self.connects.setdefault(device.name, []).append(time.monotonic())
+        return FakePeripheral(device, self.latencies.get(device.name, 0.0), self.reads_per_link.get(device.name))
+
+    def read(self, peripheral, device):
+        return peripheral.read()
+
+    def sink(self, device, readings):
+        with self.lock:
+            self.readings.setdefault(device.name, []).append(time.monotonic())
+
+    def count(self, name):
+        with self.lock:
+            return len(self.readings.get(name, ()))
+
+
+def device(name, period=0.0):
+    return PolledDevice(name, "00:00:00:00:00:00", ["value"], ["2a1c"], {}, period)
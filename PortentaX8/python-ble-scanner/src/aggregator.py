@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import threading, time
+from influxdb_client import Point, WritePrecision
+
+#Seconds a window stays open past its end before it is emitted by the timer
+CLOSE_GRACE = 0.5
+
+#Positions in the per field statistics list
+_COUNT, _SUM, _MIN, _MAX, _LAST = range(5)
+
+
+#A tumbling window of window seconds, aligned on the epoch, written to the
+#measurement named after the device followed by suffix
+class Rollup:
+    def __init__(self, window, suffix):
+        self.window = window
+        self.suffix = suffix
+
+
+#Rolls the readings of every device up into tumbling windows, keeping the
+#count, sum, min, max and last value of each field, so each sample costs O(1).
+#A window is emitted as a point with <field>_min, _max, _mean, _count and _last
+#fields, timestamped at the window start, as soon as a sample for a later window
+#arrives or, at the latest, shortly after the window ends.
+class Aggregator(threading.Thread):
+    def __init__(self, rollups, emit):
+        threading.Thread.__init__(self, name="aggregator", daemon=True)
+        self.rollups = rollups
+        self.emit = emit
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        #(rollup index, device name) -> [window start, device, {field: statistics}]
+        self.windows = {}
+        #(rollup index, device name) -> start of the last window emitted
+        self.emitted = {}
+        #Samples left out of a rollup because their window had already been emitted,
+        #adding them would emit a second point overwriting the first one in InfluxDB
+        self.late = 0
+
+    def add(self, device, readings, timestamp):
+        closed = []
+        with self.lock:
+            for n, rollup in enumerate(self.rollups):
+                start = timestamp - timestamp % rollup.window
+                key = (n, device.name)
+                if key in self.emitted and start <= self.emitted[key]:
+                    self.late += 1
+                    continue
+                window = self.windows.get(key)
+                if window is None or start > window[0]:
+                    if window is not None:
+                        closed.append((rollup, window))
+                        self.emitted[key] = window[0]
+                    window = self.windows[key] = [start, device, {}]
+                fields = window[2]
+                for label, value in readings.items():
+                    if isinstance(value, bool):
+                        continue
+                    stats = fields.get(label)
+                    if stats is None:
+                        fields[label] = [1, value, value, value, value]
+                        continue
+                    stats[_COUNT] += 1
+                    stats[_SUM] += value
+                    if value < stats[_MIN]:
+                        stats[_MIN] = value
+                    if value > stats[_MAX]:
+                        stats[_MAX] = value
+                    stats[_LAST] = value
+        for rollup, window in closed:
+            self._emit(rollup, window)
+
+    #Emits the windows that ended before now, or all of them
+    def flush(self, now=None):
+        closed = []
+        with self.lock:
+            for key, window in list(self.windows.items()):
+                rollup = self.rollups[key[0]]
+                if now is None or window[0] + rollup.window <= now:
+                    closed.append((rollup, window))
+                    self.emitted[key] = window[0]
+                    del self.windows[key]
+        for rollup, window in closed:
+            self._emit(rollup, window)
+
+    def run(self):
+        while True:
+            now = time.time()
+            next_close = min(now - now % rollup.window + rollup.window for rollup in self.rollups)
+            if self.stop_event.wait(next_close + CLOSE_GRACE - now):
+                return
+            self.flush(time.time() - CLOSE_GRACE)
+
+    #Stops the timer and emits the windows still open, even if incomplete
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.flush()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_traceback):
+        self.stop()
+
+    def _emit(self, rollup, window):
+        start, device, fields = window
+        if not fields:
+            return
+        point = Point(device.name + rollup.suffix).time(int(start * 1e9), WritePrecision.NS)
+        for key, value in device.tags.items():
+            point.tag(key, value)
+        for label, stats in fields.items():
+            point.field(label + "_min", stats[_MIN])
+            point.field(label + "_max", stats[_MAX])
+            point.field(label + "_mean", stats[_SUM] / stats[_COUNT])
+            point.field(label + "_count", stats[_COUNT])
+            point.field(label + "_last", stats[_LAST])
+        self.emit(point)
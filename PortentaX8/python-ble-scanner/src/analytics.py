@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+
+#Offline analytics over readings exported from InfluxDB, needs numpy.
+#Exports are loaded into a columnar Table and every computation is vectorized.
+#Times are int64 nanoseconds since the epoch, resampling periods are in seconds
+#and rolling windows are in samples.
+#
+#Usage: analytics.py EXPORT [--period SECONDS] [--window SAMPLES] [--co2-alert PPM] [--alert-minutes MINUTES]
+#       analytics.py --benchmark [ROWS]
+
+import argparse, csv, os, tempfile, time
+import numpy as np
+
+#Columns of an InfluxDB annotated CSV export that are not tags
+CSV_COLUMNS = ("", "result", "table", "_start", "_stop", "_time", "_value", "_field", "_measurement")
+#Spellings of booleans in line protocol
+_TRUE = ("t", "T", "true", "True", "TRUE")
+_FALSE = ("f", "F", "false", "False", "FALSE")
+#Rows of spans copied at once by _gather, bounds the size of its index arrays
+_GATHER_ROWS = 1 << 14
+#Upper CO2 limits in ppm of the classes good and elevated, above the last one the
+#air is unacceptable (German Environment Agency guide values for indoor air)
+CO2_CLASSES = (1000, 2000)
+#Upper humidex limits of the classes little, some and great discomfort, above the
+#last one it is dangerous (Environment Canada)
+HUMIDEX_CLASSES = (29, 39, 45)
+#Rows written to temporary exports when benchmarking the loaders
+BENCHMARK_EXPORT_ROWS = 1_000_000
+
+
+#Wide table of points: one row per point, a time and measurement column,
+#a column per tag (empty string when unset) and a float64 column per field
+#(NaN when unset, booleans as 0/1, strings are dropped)
+class Table:
+    def __init__(self, time, measurement, tags, fields):
+        self.time = time
+        self.measurement = measurement
+        self.tags = tags
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.time)
+
+    #Rows of the given measurement with the given tag values, sorted by time
+    def select(self, measurement=None, **tags):
+        mask = np.ones(len(self), dtype=bool)
+        if measurement is not None:
+            mask &= self.measurement == measurement
+        for key, value in tags.items():
+            if key not in self.tags:
+                mask[:] = False
+                break
+            mask &= self.tags[key] == value
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(self.time[rows], kind="stable")]
+        return Table(
+            self.time[rows],
+            self.measurement[rows],
+            dict((key, values[rows]) for key, values in self.tags.items()),
+            dict((key, values[rows]) for key, values in self.fields.items()),
+        )
+
+
+def _split(text, separator):
+    #Splits on separator outside of double quotes, honouring backslash escapes
+    parts = []
+    current = []
+    quoted = False
+    escaped = False
+    for c in text:
+        if escaped:
+            current.append(c)
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == '"':
+            quoted = not quoted
+            current.append(c)
+        elif c == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+    parts.append("".join(current))
+    return parts
+
+
+def _field_value(text):
+    if not text:
+        return None
+    last = text[-1]
+    if last == '"':
+        return None
+    if last == "i" or last == "u":
+        return float(text[:-1])
+    if text in _TRUE:
+        return 1.0
+    if text in _FALSE:
+        return 0.0
+    return float(text)
+
+
+def _lines(data):
+    #The buffer of data and the start and end offsets of its lines, without line breaks
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n"))
+    if len(buf) and buf[-1] != ord("\n"):
+        ends = np.r_[ends, len(buf)]
+    starts = np.r_[np.int64(0), ends[:-1] + 1] if len(ends) else ends
+    ends = ends - ((ends > starts) & (buf[ends - 1] == ord("\r")))
+    return buf, starts, ends
+
+
+def _find(buf, starts, ends, separator):
+    #Offsets of separator inside the sorted, disjoint spans and the span each one is in
+    positions = _positions(buf, starts, ends, separator)
+    span = np.searchsorted(starts, positions, side="right") - 1
+    inside = positions < ends[span]
+    return positions[inside], span[inside]
+
+
+def _positions(buf, starts, ends, separator):
+    #Offsets of separator from the first span to the end of the last one
+    if not len(starts):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(buf[starts[0]:ends[-1]] == ord(separator)) + starts[0]
+
+
+def _columns(buf, starts, ends, separator, count):
+    #Splits every span into count columns, returns their start and end offsets as (spans, count) arrays
+    positions = _positions(buf, starts, ends, separator)
+    if len(positions) == (count - 1) * len(starts):
+        positions = positions.reshape(len(starts), count - 1)
+        #Sorted, so each span has its own count - 1 when the first and last are inside it
+        aligned = np.all(positions[:, 0] >= starts) and np.all(positions[:, -1] < ends)
+    else:
+        aligned = False
+    if not aligned:
+        positions, span = _find(buf, starts, ends, separator)
+        if np.any(np.bincount(span, minlength=len(starts)) != count - 1):
+            raise ValueError("Expected %d columns separated by %r on every line" % (count, separator))
+        positions = positions.reshape(len(starts), count - 1)
+    return np.column_stack((starts, positions + 1)), np.column_stack((positions, ends))
+
+
+def _gather(buf, starts, ends):
+    #Copies the spans into a fixed width bytes array, so they can be compared and converted in bulk
+    width = max(int((ends - starts).max()), 1) if len(starts) else 1
+    out = np.empty((len(starts), width), dtype=np.uint8)
+    offsets = np.arange(width)
+    lengths = ends - starts
+    for first in range(0, len(starts), _GATHER_ROWS):
+        rows = slice(first, first + _GATHER_ROWS)
+        np.multiply(buf.take(starts[rows, None] + offsets, mode="clip"), offsets < lengths[rows, None], out=out[rows])
+    return out.view("S%d" % width).ravel()
+
+
+def _numbers(text):
+    #Field values from a bytes array, booleans as 0/1 and NaN for empty ones.
+    #Raises ValueError when one of them is not a number. The first bytes are
+    #lower cased, an empty value only has padding.
+    initial = text.view(np.uint8)[::text.dtype.itemsize] | 0x20
+    word = (initial == ord("t")) | (initial == ord("f"))
+    number = (initial != 0x20) & ~word
+    if number.all():
+        return text.astype(float)
+    values = np.full(len(text), np.nan)
+    values[number] = text[number].astype(float)
+    if word.any():
+        words = text[word]
+        booleans = np.full(len(words), np.nan)
+        booleans[np.isin(words, np.array(_TRUE, dtype="S"))] = 1.0
+        booleans[np.isin(words, np.array(_FALSE, dtype="S"))] = 0.0
+        if np.isnan(booleans).any():
+            raise ValueError("Not a number or boolean: %r" % words[np.isnan(booleans)][0])
+        values[word] = booleans
+    return values
+
+
+def _series(keys):
+    #Numbers the distinct series keys in order of appearance
+    keys = np.asarray(keys)
+    _, first, series = np.unique(_hash(keys) if keys.dtype.kind == "S" else keys, return_index=True, return_inverse=True)
+    series = series.ravel()
+    #A hash collision merged two keys, number the keys themselves
+    if keys.dtype.kind == "S" and np.any(keys[first][series] != keys):
+        _, first, series = np.unique(keys, return_index=True, return_inverse=True)
+        series = series.ravel()
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return [key.decode() if isinstance(key, bytes) else key for key in keys[first[order]].tolist()], rank[series]
+
+
+def _hash(keys):
+    #64 bit hashes of a bytes array, np.unique sorts them much faster than the bytes
+    width = -(-keys.dtype.itemsize // 8) * 8
+    words = np.zeros((len(keys), width), dtype=np.uint8)
+    words[:, :keys.dtype.itemsize] = keys.view(np.uint8).reshape(len(keys), keys.dtype.itemsize)
+    multipliers = np.random.default_rng(0).integers(1, 2**63, width // 8, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    return (words.view(np.uint64) * multipliers).sum(axis=1, dtype=np.uint64)
+
+
+def _table(unique_keys, series, times, field_rows):
+    #The series keys are only parsed once per distinct key
+    parsed = [_parse_series_key(key) for key in unique_keys]
+    measurements = np.array([measurement for measurement, _ in parsed], dtype=str)
+    tag_names = sorted(set(name for _, tags in parsed for name in tags))
+    tags = {}
+    for name in tag_names:
+        values = np.array([row_tags.get(name, "") for _, row_tags in parsed], dtype=str)
+        tags[name] = values[series]
+    fields = {}
+    for name, (rows, values) in field_rows.items():
+        column = np.full(len(times), np.nan)
+        column[rows] = values
+        fields[name] = column
+    return Table(times, measurements[series], tags, fields)
+
+
+def _empty_table():
+    return _table([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), {})
+
+
+def _parse_series_key(key):
+    parts = _split(key, ",") if "\\" in key else key.split(",")
+    tags = {}
+    for part in parts[1:]:
+        name, _, value = part.partition("=")
+        tags[name] = value
+    return parts[0], tags
+
+
+#Loads InfluxDB line protocol, one point per line, as written by the scanner
+def load_line_protocol(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\\" in data or b'"' in data:
+        lines = [line for line in data.decode("utf-8").split("\n") if line and line[0] != "#"]
+        return _load_escaped_lines(lines)
+    #Nothing is escaped or quoted, so the lines are cut into columns on the
+    #offsets of their separators and every column is parsed in one go
+    buf, starts, ends = _lines(data)
+    keep = (ends > starts) & (buf[np.minimum(starts, len(buf) - 1)] != ord("#"))
+    starts = starts[keep]
+    ends = ends[keep]
+    if not len(starts):
+        return _empty_table()
+    try:
+        column_starts, column_ends = _columns(buf, starts, ends, " ", 3)
+    except ValueError:
+        raise ValueError("Malformed line protocol, every line needs a series key, fields and a timestamp")
+    keys = _gather(buf, column_starts[:, 0], column_ends[:, 0])
+    times = _gather(buf, column_starts[:, 2], column_ends[:, 2]).astype(np.int64)
+    #Fields are split on their commas and then on their one equals sign
+    fieldset_starts = column_starts[:, 1]
+    fieldset_ends = column_ends[:, 1]
+    commas, point = _find(buf, fieldset_starts, fieldset_ends, ",")
+    field_starts = np.sort(np.r_[fieldset_starts, commas + 1], kind="stable")
+    field_ends = np.sort(np.r_[commas, fieldset_ends], kind="stable")
+    point_rows = np.repeat(np.arange(len(starts), dtype=np.int64), np.bincount(point, minlength=len(starts)) + 1)
+    equals, field = _find(buf, field_starts, field_ends, "=")
+    if np.any(np.bincount(field, minlength=len(field_starts)) != 1):
+        raise ValueError("Malformed line protocol, every field needs a name and a value")
+    #Only integers end in i or u, booleans are the only other unquoted values
+    last = buf[field_ends - 1]
+    value_ends = field_ends - ((field_ends > equals + 1) & ((last == ord("i")) | (last == ord("u"))))
+    values = _numbers(_gather(buf, equals + 1, value_ends))
+    names = _gather(buf, field_starts, equals)
+    present = ~np.isnan(values)
+    unique_keys, series = _series(keys)
+    return _table(unique_keys, series, times, _field_rows(names[present], point_rows[present], values[present]))
+
+
+def _field_rows(names, rows, values):
+    #{field name: (rows, values)} from a bytes array of field names
+    unique, index = _series(names)
+    field_rows = {}
+    for n, name in enumerate(unique):
+        mask = index == n
+        field_rows[name] = (rows[mask], values[mask])
+    return field_rows
+
+
+def _load_escaped_lines(lines):
+    keys = []
+    times = []
+    field_rows = {}
+    for line in lines:
+        escaped = "\\" in line or '"' in line
+        parts = _split(line, " ") if escaped else line.split(" ")
+        if len(parts) != 3:
+            raise ValueError("Line protocol without a timestamp or malformed: %r" % line)
+        row = len(times)
+        for field in _split(parts[1], ",") if escaped else parts[1].split(","):
+            name, _, text = field.partition("=")
+            value = _field_value(text)
+            if value is None:
+                continue
+            rows_values = field_rows.get(name)
+            if rows_values is None:
+                rows_values = field_rows[name] = ([], [])
+            rows_values[0].append(row)
+            rows_values[1].append(value)
+        keys.append(parts[0])
+        times.append(int(parts[2]))
+    unique_keys, series = _series(keys)
+    field_rows = dict((name, (np.array(rows, dtype=np.int64), np.array(values))) for name, (rows, values) in field_rows.items())
+    return _table(unique_keys, series, np.array(times, dtype=np.int64), field_rows)
+
+
+def _parse_rfc3339(values):
+    #datetime64 doesn't take a timezone designator, exports are always in UTC
+    values = np.char.rstrip(np.asarray(values, dtype="S"), b"Z")
+    return values.astype("datetime64[ns]").astype(np.int64)
+
+
+def _csv_value(text):
+    try:
+        value = _field_value(text.decode())
+    except ValueError:
+        value = None
+    return np.nan if value is None else value
+
+
+#Loads an InfluxDB annotated CSV export (data explorer download or
+#influx query --raw), with one row per (time, field), into one row per point
+def load_csv(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if b'"' in data:
+        return _load_quoted_csv(path)
+    buf, starts, ends = _lines(data)
+    blank = ends == starts
+    annotation = ~blank & (buf[np.minimum(starts, len(buf) - 1)] == ord("#"))
+    rows = ~blank & ~annotation
+    #Tables are separated by blank lines and each one has its own header
+    headers = np.flatnonzero(rows & np.r_[True, ~rows[:-1]])
+    parts = []
+    for header, end in zip(headers, np.r_[headers[1:], len(starts)]):
+        names = bytes(buf[starts[header]:ends[header]]).decode("utf-8").split(",")
+        columns = dict((name, i) for i, name in enumerate(names))
+        table = header + 1 + np.flatnonzero(rows[header + 1:end])
+        column_starts, column_ends = _columns(buf, starts[table], ends[table], ",", len(names))
+
+        def column(i):
+            return _gather(buf, column_starts[:, i], column_ends[:, i])
+
+        text = column(columns["_value"])
+        try:
+            values = _numbers(text)
+        except ValueError:
+            values = np.array([_csv_value(value) for value in text.tolist()])
+        #Build the same series key as line protocol, tags sorted by name
+        keys = column(columns["_measurement"])
+        for name, i in sorted((name, i) for name, i in columns.items() if name not in CSV_COLUMNS):
+            tag = column(i)
+            keys = np.char.add(keys, np.where(tag != b"", np.char.add(("," + name + "=").encode(), tag), b""))
+        present = ~np.isnan(values)
+        parts.append((keys[present], column(columns["_time"])[present], column(columns["_field"])[present], values[present]))
+    if not parts:
+        return _empty_table()
+    keys, times, field_names, values = (np.concatenate(column) for column in zip(*parts))
+    return _pivot(keys, _parse_rfc3339(times), field_names, values)
+
+
+def _load_quoted_csv(path):
+    columns = None
+    series_keys = []
+    times = []
+    field_names = []
+    values = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row or (row[0].startswith("#")):
+                columns = None
+                continue
+            if columns is None:
+                columns = dict((name, i) for i, name in enumerate(row))
+                time_column = columns["_time"]
+                value_column = columns["_value"]
+                field_column = columns["_field"]
+                measurement_column = columns["_measurement"]
+                tag_columns = sorted((name, i) for name, i in columns.items() if name not in CSV_COLUMNS)
+                continue
+            try:
+                value = _field_value(row[value_column])
+            except ValueError:
+                value = None
+            if value is None:
+                continue
+            key = ",".join([row[measurement_column]] + ["%s=%s" % (name, row[i]) for name, i in tag_columns if row[i]])
+            series_keys.append(key)
+            times.append(row[time_column])
+            field_names.append(row[field_column])
+            values.append(value)
+    if not series_keys:
+        return _empty_table()
+    return _pivot(series_keys, _parse_rfc3339(times), np.array(field_names, dtype="S"), np.array(values))
+
+
+def _pivot(keys, times, field_names, values):
+    #One row per (time, field) to one row per point, the distinct (series, time) pairs
+    unique_keys, series = _series(keys)
+    order = np.lexsort((times, series))
+    new_point = np.ones(len(order), dtype=bool)
+    new_point[1:] = (np.diff(series[order]) != 0) | (np.diff(times[order]) != 0)
+    point = np.empty(len(order), dtype=np.int64)
+    point[order] = np.cumsum(new_point) - 1
+    first = order[new_point]
+    return _table(unique_keys, series[first], times[first], _field_rows(field_names, point, values))
+
+
+#Buckets samples into period second bins, ignoring NaN values. Returns the bin
+#start times and the mean, min, max, count, sum or last value of each bin.
+def resample(times, values, period, how="mean"):
+    keep = ~np.isnan(values)
+    times = times[keep]
+    values = values[keep]
+    period_ns = int(period * 1e9)
+    bins = times // period_ns
+    #Sorted by bin, then by time so the last sample of each bin is the latest
+    order = np.lexsort((times, bins))
+    bins = bins[order]
+    values = values[order]
+    if len(bins) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    if how == "mean":
+        result = np.add.reduceat(values, starts) / (ends - starts)
+    elif how == "sum":
+        result = np.add.reduceat(values, starts)
+    elif how == "min":
+        result = np.minimum.reduceat(values, starts)
+    elif how == "max":
+        result = np.maximum.reduceat(values, starts)
+    elif how == "count":
+        result = (ends - starts).astype(float)
+    elif how == "last":
+        result = values[ends - 1]
+    else:
+        raise ValueError("Unknown aggregation %r" % how)
+    return bins[starts] * period_ns, result
+
+
+def _rolling_sums(values, window):
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    def windowed(x):
+        c = np.cumsum(np.r_[0.0, x])
+        return c[window:] - c[:-window]
+    return windowed(valid.astype(float)), windowed(filled), windowed(filled * filled)
+
+
+#Mean over each window of samples ending at every sample, NaN for the first window - 1
+def rolling_mean(values, window):
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    count, total, _ = _rolling_sums(values, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result[window - 1:] = total / count
+    return result
+
+
+#Population standard deviation over each window of samples, like rolling_mean
+def rolling_std(values, window):
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    count, total, squares = _rolling_sums(values, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        result[window - 1:] = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+    return result
+
+
+#How many standard deviations each sample lies from the mean of the window
+#of samples before it, NaN where there is no full window or no spread
+def anomaly_scores(values, window):
+    mean = rolling_mean(values, window)
+    std = rolling_std(values, window)
+    scores = np.full(len(values), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores[1:] = np.abs(values[1:] - mean[:-1]) / std[:-1]
+    scores[~np.isfinite(scores)] = np.nan
+    return scores
+
+
+#Pearson correlation of two series, ignoring pairs with a NaN
+def correlation(x, y):
+    keep = ~(np.isnan(x) | np.isnan(y))
+    if keep.sum() < 2:
+        return np.nan
+    x = x[keep] - x[keep].mean()
+    y = y[keep] - y[keep].mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    return (x * y).sum() / denominator if denominator else np.nan
+
+
+#Dew point in degrees Celsius from the temperature in degrees Celsius and the
+#relative humidity in %, Magnus formula
+def dew_point(temperature, humidity):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = np.log(humidity / 100) + 17.62 * temperature / (243.12 + temperature)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+#Humidex, the temperature humid air feels like, from the temperature in degrees
+#Celsius and the relative humidity in %
+def humidex(temperature, humidity):
+    vapour_pressure = 6.112 * np.exp(17.62 * temperature / (243.12 + temperature)) * humidity / 100
+    return temperature + 5 / 9 * (vapour_pressure - 10)
+
+
+#Class of every value given the ascending upper limits of the classes, a value
+#on a limit is in the lower class. NaN values are in class -1.
+def classify(values, limits):
+    classes = np.searchsorted(np.asarray(limits), values, side="left")
+    classes[np.isnan(values)] = -1
+    return classes
+
+
+#Runs of consecutive samples above threshold that last at least min_duration
+#seconds from the first to the last sample. Returns their start and end times.
+def exceedances(times, values, threshold, min_duration=0):
+    edges = np.diff(np.r_[False, values > threshold, False].astype(np.int8))
+    starts = times[np.flatnonzero(edges == 1)]
+    ends = times[np.flatnonzero(edges == -1) - 1]
+    keep = ends - starts >= int(min_duration * 1e9)
+    return starts[keep], ends[keep]
+
+
+#Joins the people count with air quality fields room by room: both are
+#resampled to period second means and matched on the bins present in both.
+#Returns {room: (bin start times, people, {field: values})}.
+def room_join(table, fields=("co2", "temperature", "humidity", "bsec"), period=300,
+              people_measurement="nicla_vision", air_measurement="nicla_sense", people_field="people", room_tag="location"):
+    rooms = {}
+    if room_tag not in table.tags:
+        return rooms
+    for room in np.unique(table.tags[room_tag]):
+        people = table.select(people_measurement, **{room_tag: room})
+        air = table.select(air_measurement, **{room_tag: room})
+        if people_field not in people.fields or not len(people) or not len(air):
+            continue
+        people_bins, people_values = resample(people.time, people.fields[people_field], period)
+        joined = {}
+        bins = people_bins
+        for field in fields:
+            if field in air.fields:
+                field_bins, field_values = resample(air.time, air.fields[field], period)
+                column = np.full(len(people_bins), np.nan)
+                _, at_people, at_field = np.intersect1d(people_bins, field_bins, assume_unique=True, return_indices=True)
+                column[at_people] = field_values[at_field]
+                joined[field] = column
+        rooms[str(room)] = (bins, people_values, joined)
+    return rooms
+
+
+def synthetic_table(rows, rooms=4, seed=0):
+    #Nicla Vision and Nicla Sense points for several rooms, one point every 5 s
+    random = np.random.default_rng(seed)
+    times = np.int64(1_660_000_000) * 10**9 + (np.arange(rows, dtype=np.int64) // (2 * rooms)) * 5 * 10**9
+    room = np.arange(rows) % rooms
+    vision = (np.arange(rows) // rooms) % 2 == 0
+    people = np.clip(np.round(3 + 3 * np.sin(times / 3.6e12 + room) + random.normal(0, 0.5, rows)), 0, None)
+    co2 = 420 + 60 * people + random.normal(0, 15, rows)
+    co2[random.random(rows) < 1e-4] += 2000
+    temperature = 21 + 0.3 * people + random.normal(0, 0.2, rows)
+    humidity = 40 + 2 * people + random.normal(0, 1, rows)
+    location = np.array(["Room%d" % n for n in range(rooms)])[room]
+    measurement = np.where(vision, "nicla_vision", "nicla_sense")
+    return Table(times, measurement, {"location": location}, {
+        "people": np.where(vision, people, np.nan),
+        "co2": np.where(vision, np.nan, co2),
+        "temperature": np.where(vision, np.nan, temperature),
+        "humidity": np.where(vision, np.nan, humidity),
+    })
+
+
+def _write_line_protocol(table, path):
+    #Writes the table as line protocol, leaving out the NaN fields of each point
+    keys = np.char.encode(table.measurement)
+    for name, values in sorted(table.tags.items()):
+        values = np.char.encode(values)
+        keys = np.char.add(keys, np.where(values != b"", np.char.add(("," + name + "=").encode(), values), b""))
+    fields = np.full(len(table), b"")
+    for name, values in sorted(table.fields.items()):
+        fields = np.char.add(fields, np.where(np.isnan(values), b"", np.char.add(("," + name + "=").encode(), values.astype("S"))))
+    lines = np.char.add(np.char.add(keys, b" "), np.char.add(np.char.lstrip(fields, b","), b" "))
+    lines = np.char.add(lines, table.time.astype("S"))
+    with open(path, "wb") as f:
+        f.write(b"\n".join(lines.tolist()) + b"\n")
+
+
+def _write_csv(table, path):
+    #Writes the table as an annotated CSV export with a table per field, returns the number of rows
+    tag_names = sorted(table.tags)
+    times = np.char.add(table.time.astype("datetime64[ns]").astype("S"), b"Z")
+    written = 0
+    with open(path, "wb") as f:
+        for n, (name, values) in enumerate(sorted(table.fields.items())):
+            present = ~np.isnan(values)
+            f.write(("#datatype,string,long,dateTime:RFC3339,dateTime:RFC3339,dateTime:RFC3339,double,string,string%s\n" % (",string" * len(tag_names))).encode())
+            f.write(("#group,false,false,true,true,false,false,true,true%s\n" % (",true" * len(tag_names))).encode())
+            f.write(("#default,_result%s\n" % ("," * (len(CSV_COLUMNS) + len(tag_names) - 2))).encode())
+            f.write((",".join(CSV_COLUMNS + tuple(tag_names)) + "\n").encode())
+            rows = np.char.add(("," * 2 + "%d" % n + "," * 3).encode(), times[present])
+            rows = np.char.add(np.char.add(rows, b","), values[present].astype("S"))
+            rows = np.char.add(rows, ("," + name + ",").encode())
+            rows = np.char.add(rows, np.char.encode(table.measurement[present]))
+            for tag in tag_names:
+                rows = np.char.add(np.char.add(rows, b","), np.char.encode(table.tags[tag][present]))
+            f.write(b"\n".join(rows.tolist()) + b"\n\n")
+            written += len(rows)
+    return written
+
+
+def _report(table, period, window, co2_alert, alert_minutes):
+    print("%d points, measurements: %s" % (len(table), ", ".join(np.unique(table.measurement))))
+    for room, (bins, people, fields) in sorted(room_join(table, period=period).items()):
+        print("%s: %d bins of %ds" % (room, len(bins), period))
+        for field, values in sorted(fields.items()):
+            scores = anomaly_scores(values, window)
+            print("  people vs %s: correlation %.3f, %d anomalies (score > 4)" % (
+                field, correlation(people, values), np.count_nonzero(scores > 4)))
+        if "co2" in fields:
+            classes = np.bincount(classify(fields["co2"], CO2_CLASSES) + 1, minlength=len(CO2_CLASSES) + 2)[1:]
+            starts, ends = exceedances(bins, fields["co2"], co2_alert, alert_minutes * 60)
+            print("  co2 bins good/elevated/unacceptable: %s, %d alerts above %d ppm for %d min or more" % (
+                "/".join(map(str, classes)), len(starts), co2_alert, alert_minutes))
+        if "temperature" in fields and "humidity" in fields:
+            values = humidex(fields["temperature"], fields["humidity"])
+            classes = np.bincount(classify(values, HUMIDEX_CLASSES) + 1, minlength=len(HUMIDEX_CLASSES) + 2)[1:]
+            print("  humidex bins little/some/great discomfort/dangerous: %s, highest %.1f" % (
+                "/".join(map(str, classes)), np.nanmax(values) if not np.isnan(values).all() else np.nan))
+
+
+def _benchmark(rows):
+    started = time.perf_counter()
+    table = synthetic_table(rows)
+    print("generated %d rows in %.2fs" % (rows, time.perf_counter() - started))
+    sense = table.select("nicla_sense")
+    with tempfile.TemporaryDirectory() as directory:
+        #The exports are written from a smaller table, they take about 100 bytes a row
+        exported = synthetic_table(min(rows, BENCHMARK_EXPORT_ROWS))
+        line_protocol = os.path.join(directory, "export.lp")
+        annotated_csv = os.path.join(directory, "export.csv")
+        _write_line_protocol(exported, line_protocol)
+        csv_rows = _write_csv(exported, annotated_csv)
+        steps = (
+            ("load line protocol", len(exported), lambda: load_line_protocol(line_protocol)),
+            ("load csv", csv_rows, lambda: load_csv(annotated_csv)),
+            ("select", rows, lambda: table.select("nicla_sense", location="Room1")),
+            ("resample 300s", len(sense), lambda: resample(sense.time, sense.fields["co2"], 300)),
+            ("rolling mean/std 120", len(sense), lambda: (rolling_mean(sense.fields["co2"], 120), rolling_std(sense.fields["co2"], 120))),
+            ("anomaly scores 120", len(sense), lambda: anomaly_scores(sense.fields["co2"], 120)),
+            ("humidex", len(sense), lambda: humidex(sense.fields["temperature"], sense.fields["humidity"])),
+            ("co2 classes", len(sense), lambda: classify(sense.fields["co2"], CO2_CLASSES)),
+            ("co2 alerts", len(sense), lambda: exceedances(sense.time, sense.fields["co2"], CO2_CLASSES[0], 900)),
+            ("room join 300s", rows, lambda: room_join(table, period=300)),
+        )
+        for name, count, step in steps:
+            started = time.perf_counter()
+            step()
+            elapsed = time.perf_counter() - started
+            print("%-22s %9d rows %7.3fs  %6.1fM rows/s" % (name, count, elapsed, count / elapsed / 1e6))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Occupancy vs air quality analytics over InfluxDB exports")
+    parser.add_argument("export", nargs="?", help="line protocol (.lp, .txt) or annotated CSV (.csv) export")
+    parser.add_argument("--period", type=int, default=300, help="resampling period in seconds")
+    parser.add_argument("--window", type=int, default=12, help="anomaly window in resampled bins")
+    parser.add_argument("--co2-alert", type=int, default=CO2_CLASSES[0], metavar="PPM", help="CO2 level to alert on")
+    parser.add_argument("--alert-minutes", type=int, default=15, help="minutes the CO2 level has to last to alert")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=10_000_000, metavar="ROWS", help="time the analytics on synthetic data")
+    args = parser.parse_args()
+    if args.benchmark:
+        _benchmark(args.benchmark)
+    elif args.export:
+        load = load_csv if args.export.endswith(".csv") else load_line_protocol
+        _report(load(args.export), args.period, args.window, args.co2_alert, args.alert_minutes)
+    else:
+        parser.error("an export or --benchmark is required")
@@ -1,109 +1,142 @@
 #!/usr/bin/env python3
 
-import os
-import random, time, binascii, struct
-from datetime import datetime
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
-from bluepy.btle import Peripheral, UUID
-
-#Nicla Sense Me details
-nicla_sense_mac = os.getenv("NICLA_SENSE_MAC")
-#Monitored characteristics
-nicla_sense_labels = ["temperature", "humidity", "pressure", "bsec", "co2", "gas"]
-nicla_sense_uuids_values = [UUID(0x2A1C), UUID(0x2A6F), UUID(0x2AA3), UUID(0x2BCF), UUID(0x2BD0), UUID(0x27AD)]
-nicla_sense_readings = [0,0,0,0,0,0]
-
-
-#Nicla Vision details
-nicla_vision_mac = os.getenv("NICLA_VISION_MAC")
-#Monitored characteristics
-nicla_vision_labels = ["people"]
-nicla_vision_uuids_values = [UUID(0x2A1C)]
-nicla_vision_readings = [0]
-
-#InfluxDb details
-# You can generate an API token from the "API Tokens Tab" in the UI
-token = "x8bletoken"
-org = "arduino"
-bucket = "x8-iot"
-
-
-nicla_sense = Peripheral(nicla_sense_mac)
-nicla_vision = Peripheral(nicla_vision_mac)
-
-
-while True:
-    #Getting the readings from the Nicla Vision
-    i = 0
-    for service in nicla_vision.getServices():
-        for characteristic in service.getCharacteristics():
-           
-            print("Characteristic - id: %s\tname (if exists): %s\tavailable methods: %s" % (str(characteristic.uuid), str(characteristic), characteristic.propertiesToString()))
-            if(characteristic.uuid in nicla_vision_uuids_values):
-                ch = nicla_vision.getCharacteristics(uuid=characteristic.uuid)[0]
-                print(ch)
-                if (ch.supportsRead()):
-                    val = binascii.b2a_hex(ch.read())
-                    print(val)
-                    val = binascii.unhexlify(val)
-                    print(val)
-                    val = struct.unpack('f', val)[0]
-                    print(val)
-                    nicla_vision_readings[i] = val
-                    print(i)
-                    print (str(val))
-                    i += 1
-                    print(i)
-                    time.sleep(1)
-    print (nicla_vision_labels)
-    print (nicla_vision_uuids_values)
-    print (nicla_vision_readings)
-    #Writting them in the Portenta container in InfluxDB
-    with InfluxDBClient(url="http://x8-host:8086", token=token, org=org) as client:
-        write_api = client.write_api(write_options=SYNCHRONOUS)
-
-        point = Point("nicla_vision") \
-        .field("location", random.shuffle(["ConferenceRoom", "MeetingRoom", "CoworkingSpace"])) \
-        .field(nicla_vision_labels[0], nicla_vision_readings[0]) \
-        .time(datetime.utcnow(), WritePrecision.NS)
-
-        write_api.write(bucket, org, point)
-        time.sleep(1)
-    #Getting the readings from the Nicla Sense ME
-    i = 0
-    for service in nicla_sense.getServices():
-        for characteristic in service.getCharacteristics():
-           
-            print("Characteristic - id: %s\tname (if exists): %s\tavailable methods: %s" % (str(characteristic.uuid), str(characteristic), characteristic.propertiesToString()))
-            if(characteristic.uuid in nicla_sense_uuids_values):
-                ch = nicla_sense.getCharacteristics(uuid=characteristic.uuid)[0]
-                if (ch.supportsRead()):
-                    val = binascii.b2a_hex(ch.read())
-                    val = binascii.unhexlify(val)
-                    val = struct.unpack('f', val)[0]
-                    nicla_sense_readings[i] = val
-                    print(i)
-                    print (str(val))
-                    i += 1
-                    print(i)
-                    time.sleep(1)
-    print (nicla_sense_labels)
-    print (nicla_sense_uuids_values)
-    print (nicla_sense_readings)
-    #Writting them in the Portenta container in InfluxDB
-    with InfluxDBClient(url="http://x8-host:8086", token=token, org=org) as client:
-        write_api = client.write_api(write_options=SYNCHRONOUS)
-
-        point = Point("nicla_sense") \
-        .field("location", random.shuffle(["ConferenceRoom", "MeetingRoom", "CoworkingSpace"])) \
-        .field(nicla_sense_labels[0], nicla_sense_readings[0]) \
-        .field(nicla_sense_labels[1], nicla_sense_readings[1]) \
-        .field(nicla_sense_labels[2], nicla_sense_readings[2]) \
-        .field(nicla_sense_labels[3], nicla_sense_readings[3]) \
-        .field(nicla_sense_labels[4], nicla_sense_readings[4]) \
-        .field(nicla_sense_labels[5], nicla_sense_readings[5]) \
-        .time(datetime.utcnow(), WritePrecision.NS)
-
-        write_api.write(bucket, org, point)
-        time.sleep(1)
+import os, sys
+import struct, time
+from influxdb_client import Point, WritePrecision
+from bluepy.btle import Peripheral
+import config
+from aggregator import Aggregator
+from gattcache import HandleCache, ServiceChangedDelegate
+from poller import Poller
+from influxwriter import InfluxWriter
+from spool import Spool
+
+#Devices, characteristics and sinks are described in a YAML file, see blescanner.yml
+config_path = os.getenv("BLESCANNER_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "blescanner.yml"))
+
+#Client Characteristic Configuration value enabling notifications
+CCCD_NOTIFY = struct.pack('<H', 0x0001)
+
+
+try:
+    settings = config.load(config_path)
+except config.ConfigError as e:
+    sys.exit("Invalid configuration: %s" % e)
+
+influx = settings.influxdb
+handle_cache = HandleCache()
+influx_writer = InfluxWriter(
+    influx.url, influx.token, influx.org, influx.bucket,
+    batch_size=influx.batch_size,
+    flush_interval=influx.flush_interval,
+    max_pending=influx.max_pending,
+    spool=Spool(influx.spool_dir) if influx.spool_dir else None,
+    retry_interval=influx.retry_interval,
+)
+aggregator = Aggregator(influx.rollups, influx_writer.write) if influx.rollups else None
+
+
+#Routes the values notified by a device to the InfluxDB writer
+class NotificationDelegate(ServiceChangedDelegate):
+    def __init__(self, cache, device):
+        ServiceChangedDelegate.__init__(self, cache, device.mac)
+        self.device = device
+        self.handles = None
+        self.notified = {}
+        self.polled = []
+
+    def handleNotification(self, cHandle, data):
+        if ServiceChangedDelegate.handleNotification(self, cHandle, data):
+            return
+        notified = self.notified.get(cHandle)
+        if notified is not None:
+            label, decode = notified
+            write_readings(self.device, {label: decode(data)})
+
+
+#A fresh connection may expose a different GATT database, so drop its cached handles
+def connect(device):
+    peripheral = Peripheral(device.mac)
+    handle_cache.invalidate(device.mac)
+    peripheral.withDelegate(NotificationDelegate(handle_cache, device))
+    return peripheral
+
+
+#Splits the characteristics into notified and polled ones with their decoders, enables
+#notifications on the former and reads their current value once, after that the
+#device pushes them as they change
+def subscribe(peripheral, device, handles):
+    delegate = peripheral.delegate
+    delegate.handles = handles
+    delegate.notified = {}
+    delegate.polled = []
+    readings = {}
+    for i, handle, cccd in handles:
+        label = device.labels[i]
+        decode = device.decoders[device.uuids[i]].decode
+        if cccd is None:
+            delegate.polled.append((handle, label, decode))
+        else:
+            delegate.notified[handle] = (label, decode)
+            peripheral.writeCharacteristic(cccd, CCCD_NOTIFY, withResponse=True)
+            readings[label] = decode(peripheral.readCharacteristic(handle))
+    return readings
+
+
+#Reads the characteristics that don't notify straight from their cached value handles,
+#(re)subscribing to the others whenever the handles had to be discovered again
+def read_characteristics(peripheral, device):
+    readings = {}
+    delegate = peripheral.delegate
+    handles = handle_cache.lookup(peripheral, device.uuids)
+    if delegate.handles is not handles:
+        readings = subscribe(peripheral, device, handles)
+    for handle, label, decode in delegate.polled:
+        readings[label] = decode(peripheral.readCharacteristic(handle))
+    return readings
+
+
+#Queueing the readings of a device for the InfluxDB writer in the Portenta container,
+#as they are and/or rolled up
+def write_readings(device, readings):
+    print (device.name, readings)
+    timestamp = time.time_ns()
+    #Rolled up first, write() blocks while the writer is backed up and the
+    #timer could emit the window of this timestamp meanwhile
+    if aggregator is not None:
+        aggregator.add(device, readings, timestamp / 1e9)
+    if influx.raw:
+        point = Point(device.name).time(timestamp, WritePrecision.NS)
+        for key, value in device.tags.items():
+            point.tag(key, value)
+        for label, reading in readings.items():
+            point.field(label, reading)
+
+        influx_writer.write(point)
+
+
+#Writting the connection health of every device, so link problems show up in InfluxDB
+def write_health(health):
+    timestamp = time.time_ns()
+    for name, device_health in health.items():
+        point = Point("blescanner_health") \
+        .tag("device", name) \
+        .field("connected", device_health.is_connected()) \
+        .field("uptime", device_health.uptime()) \
+        .field("availability", device_health.availability()) \
+        .field("reconnects", device_health.reconnects) \
+        .time(timestamp, WritePrecision.NS)
+        if device_health.time_to_reconnect is not None:
+            point.field("time_to_reconnect", device_health.time_to_reconnect)
+        influx_writer.write(point)
+
+
+with influx_writer:
+    if aggregator is not None:
+        aggregator.start()
+    try:
+        Poller(settings.devices, connect, read_characteristics, write_readings, settings.backoff) \
+        .run_forever(write_health, settings.health_interval)
+    finally:
+        if aggregator is not None:
+            aggregator.stop()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import os, re
+import yaml
+from bluepy.btle import UUID
+from aggregator import Rollup
+from connection import Backoff
+from decoders import Decoder
+from poller import PolledDevice
+
+MAC_PATTERN = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
+
+
+class ConfigError(Exception):
+    pass
+
+
+#Where and how readings are written to InfluxDB, raw and/or rolled up
+class InfluxConfig:
+    def __init__(self, url, token, org, bucket, batch_size, flush_interval, max_pending, spool_dir, retry_interval, raw, rollups):
+        self.url = url
+        self.token = token
+        self.org = org
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.retry_interval = retry_interval
+        self.raw = raw
+        self.rollups = rollups
+
+
+#The polling plan: the devices to poll, the sinks their readings go to, how lost
+#links are re-established and how often their health is reported
+class Config:
+    def __init__(self, devices, influxdb, backoff, health_interval):
+        self.devices = devices
+        self.influxdb = influxdb
+        self.backoff = backoff
+        self.health_interval = health_interval
+
+
+#Loads and validates a YAML configuration, see blescanner.yml.
+#${VAR} references in string values are replaced by environment variables.
+def load(path):
+    try:
+        with open(path) as f:
+            data = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError("Cannot load %s: %s" % (path, e))
+    return parse(data)
+
+
+def parse(data):
+    data = _mapping(data, "configuration")
+    devices = [_device(d, "devices[%d]" % n) for n, d in enumerate(_get(data, "devices", list, "configuration"))]
+    if not devices:
+        raise ConfigError("configuration: no devices")
+    names = [device.name for device in devices]
+    for name in names:
+        if names.count(name) > 1:
+            raise ConfigError("devices: %r is defined more than once" % name)
+    sinks = _get(data, "sinks", dict, "configuration")
+    influxdb = _influxdb(_get(sinks, "influxdb", dict, "sinks"), "sinks.influxdb")
+    backoff = _backoff(_get(data, "reconnect", dict, "configuration", {}), "reconnect")
+    health_interval = _get(data, "health_interval", (int, float), "configuration", 60)
+    if health_interval <= 0:
+        raise ConfigError("configuration.health_interval: must be positive")
+    return Config(devices, influxdb, backoff, health_interval)
+
+
+def _device(data, path):
+    data = _mapping(data, path)
+    name = _get(data, "name", str, path)
+    mac = _get(data, "mac", str, path)
+    if not MAC_PATTERN.match(mac):
+        raise ConfigError("%s.mac: %r is not a MAC address" % (path, mac))
+    period = _get(data, "period", (int, float), path, 5)
+    if period <= 0:
+        raise ConfigError("%s.period: must be positive" % path)
+    tags = _get(data, "tags", dict, path, {})
+    for key, value in tags.items():
+        if not isinstance(value, str):
+            raise ConfigError("%s.tags.%s: expected a string" % (path, key))
+    labels = []
+    uuids = []
+    decoders = {}
+    for n, characteristic in enumerate(_get(data, "characteristics", list, path)):
+        label, uuid, decoder = _characteristic(characteristic, "%s.characteristics[%d]" % (path, n))
+        if uuid in decoders:
+            raise ConfigError("%s.characteristics[%d]: %s is monitored twice" % (path, n, uuid))
+        labels.append(label)
+        uuids.append(uuid)
+        decoders[uuid] = decoder
+    if not uuids:
+        raise ConfigError("%s: no characteristics" % path)
+    return PolledDevice(name, mac, labels, uuids, decoders, period, tags)
+
+
+def _characteristic(data, path):
+    data = _mapping(data, path)
+    label = _get(data, "label", str, path)
+    uuid = _get(data, "uuid", (int, str), path)
+    try:
+        uuid = UUID(uuid)
+    except ValueError as e:
+        raise ConfigError("%s.uuid: %s" % (path, e))
+    try:
+        decoder = Decoder(
+            _get(data, "format", str, path),
+            scale=_get(data, "scale", (int, float), path, 1),
+            offset=_get(data, "offset", (int, float), path, 0),
+            unit=_get(data, "unit", str, path, None),
+            integer=_get(data, "integer", bool, path, False),
+        )
+    except ValueError as e:
+        raise ConfigError("%s.format: %s" % (path, e))
+    return label, uuid, decoder
+
+
+def _influxdb(data, path):
+    raw = _get(data, "raw", bool, path, True)
+    rollups = [_rollup(r, "%s.rollups[%d]" % (path, n)) for n, r in enumerate(_get(data, "rollups", list, path, []))]
+    if not raw and not rollups:
+        raise ConfigError("%s: raw readings are disabled and there are no rollups" % path)
+    suffixes = [rollup.suffix for rollup in rollups]
+    for suffix in suffixes:
+        if suffixes.count(suffix) > 1:
+            raise ConfigError("%s.rollups: suffix %r is used more than once" % (path, suffix))
+    return InfluxConfig(
+        url=_get(data, "url", str, path),
+        token=_get(data, "token", str, path),
+        org=_get(data, "org", str, path),
+        bucket=_get(data, "bucket", str, path),
+        batch_size=_get(data, "batch_size", int, path, 500),
+        flush_interval=_get(data, "flush_interval", (int, float), path, 1.0),
+        max_pending=_get(data, "max_pending", int, path, 10000),
+        spool_dir=_get(data, "spool_dir", str, path, None),
+        retry_interval=_get(data, "retry_interval", (int, float), path, 10.0),
+        raw=raw,
+        rollups=rollups,
+    )
+
+
+def _rollup(data, path):
+    data = _mapping(data, path)
+    window = _get(data, "window", int, path)
+    if window <= 0:
+        raise ConfigError("%s.window: must be a positive number of seconds" % path)
+    suffix = _get(data, "suffix", str, path, "_%ds" % window)
+    if not suffix:
+        raise ConfigError("%s.suffix: must not be empty" % path)
+    return Rollup(window, suffix)
+
+
+def _backoff(data, path):
+    initial = _get(data, "initial_delay", (int, float), path, 1.0)
+    maximum = _get(data, "max_delay", (int, float), path, 60.0)
+    jitter = _get(data, "jitter", (int, float), path, 0.5)
+    if not 0 < initial <= maximum:
+        raise ConfigError("%s: expected 0 < initial_delay <= max_delay" % path)
+    if not 0 <= jitter <= 1:
+        raise ConfigError("%s.jitter: expected a fraction between 0 and 1" % path)
+    return Backoff(initial=initial, maximum=maximum, jitter=jitter)
+
+
+def _mapping(data, path):
+    if not isinstance(data, dict):
+        raise ConfigError("%s: expected a mapping" % path)
+    return data
+
+
+_REQUIRED = object()
+
+
+def _get(data, key, types, path, default=_REQUIRED):
+    if key not in data:
+        if default is _REQUIRED:
+            raise ConfigError("%s: missing %r" % (path, key))
+        return default
+    value = data[key]
+    if isinstance(value, str):
+        value = os.path.expandvars(value)
+    types = types if isinstance(types, tuple) else (types,)
+    #bool is an int, but only meaningful where a bool is expected
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        raise ConfigError("%s.%s: unexpected value %r" % (path, key, value))
+    return value
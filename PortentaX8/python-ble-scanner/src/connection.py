@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import random, time
+
+
+#Jittered exponential backoff: the n-th retry (from 0) waits initial * multiplier**n
+#seconds, capped at maximum and shortened by a random fraction of up to jitter,
+#so gateways and devices that dropped together don't retry in lockstep
+class Backoff:
+    def __init__(self, initial=1.0, maximum=60.0, multiplier=2.0, jitter=0.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt):
+        delay = min(self.maximum, self.initial * self.multiplier ** min(attempt, 64))
+        return delay * (1 - self.jitter * random.random())
+
+
+#Connection history of one device: total time connected, how often the link had
+#to be re-established and how long the last reconnect took from the moment the
+#link was lost
+class ConnectionHealth:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.connected_at = None
+        self.disconnected_at = None
+        self.connected_time = 0.0
+        self.reconnects = 0
+        self.time_to_reconnect = None
+        self.ever_connected = False
+
+    def connected(self):
+        now = time.monotonic()
+        #Failed attempts before the first connection aren't reconnects
+        if self.disconnected_at is not None and self.ever_connected:
+            self.reconnects += 1
+            self.time_to_reconnect = now - self.disconnected_at
+        self.disconnected_at = None
+        self.connected_at = now
+        self.ever_connected = True
+
+    #Called for failed connection attempts too, the outage starts at the first one
+    def disconnected(self):
+        now = time.monotonic()
+        if self.connected_at is not None:
+            self.connected_time += now - self.connected_at
+            self.connected_at = None
+        if self.disconnected_at is None:
+            self.disconnected_at = now
+
+    def is_connected(self):
+        return self.connected_at is not None
+
+    def uptime(self):
+        if self.connected_at is None:
+            return 0.0
+        return time.monotonic() - self.connected_at
+
+    def availability(self):
+        elapsed = time.monotonic() - self.started_at
+        connected_time = self.connected_time + self.uptime()
+        return connected_time / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import struct
+
+#Characteristic payload formats, all little endian like the Nicla boards send them
+FORMATS = {
+    "float32": "<f",
+    "int8": "<b",
+    "uint8": "<B",
+    "int16": "<h",
+    "uint16": "<H",
+    "int32": "<i",
+    "uint32": "<I",
+}
+
+
+#Turns a characteristic payload into a reading with a single call to decode(data):
+#the payload is unpacked in place by a precompiled struct.Struct and scaled as
+#value * scale + offset, the unit being kept for reference.
+#Readings are floats unless integer is set, every reading used to be unpacked as
+#a float and InfluxDB refuses to change the type of an existing field.
+class Decoder:
+    def __init__(self, fmt, scale=1, offset=0, unit=None, integer=False):
+        if fmt not in FORMATS:
+            raise ValueError("Unknown payload format %r, expected one of %s" % (fmt, ", ".join(FORMATS)))
+        self.fmt = fmt
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+        self.integer = integer
+        unpack_from = struct.Struct(FORMATS[fmt]).unpack_from
+        if scale == 1 and offset == 0 and (integer or fmt == "float32"):
+            self.decode = lambda data: unpack_from(data)[0]
+        elif integer:
+            self.decode = lambda data: unpack_from(data)[0] * scale + offset
+        else:
+            self.decode = lambda data: float(unpack_from(data)[0] * scale + offset)
+
+    def __repr__(self):
+        return "Decoder(%s, scale=%r, offset=%r, unit=%r, integer=%r)" % (self.fmt, self.scale, self.offset, self.unit, self.integer)
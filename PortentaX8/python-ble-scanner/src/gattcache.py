@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import struct
+from bluepy.btle import DefaultDelegate, UUID
+
+#Service Changed characteristic of the Generic Attribute service and its CCCD
+SERVICE_CHANGED_UUID = UUID(0x2A05)
+CCCD_UUID = UUID(0x2902)
+CCCD_INDICATE = struct.pack('<H', 0x0002)
+NOTIFY_PROPERTY = 0x10
+
+
+#Invalidates the cached handles of a device when it indicates Service Changed.
+#Subclasses handling other notifications should skip the ones this returns True for.
+class ServiceChangedDelegate(DefaultDelegate):
+    def __init__(self, cache, mac):
+        DefaultDelegate.__init__(self)
+        self.cache = cache
+        self.mac = mac
+
+    def handleNotification(self, cHandle, data):
+        if cHandle == self.cache.service_changed_handle(self.mac):
+            self.cache.invalidate(self.mac)
+            return True
+        return False
+
+
+#Maps the monitored UUIDs of each device (keyed by MAC) to their value handles,
+#so the GATT database is only walked once per connection
+class HandleCache:
+    def __init__(self):
+        self._handles = {}
+        self._service_changed = {}
+
+    def invalidate(self, mac):
+        self._handles.pop(mac, None)
+        self._service_changed.pop(mac, None)
+
+    def service_changed_handle(self, mac):
+        return self._service_changed.get(mac)
+
+    #Returns a list of (index in uuids, value handle, CCCD handle) for the readable or
+    #notifying characteristics, the CCCD handle being None when they don't notify.
+    #The same list is returned until the device's entry is invalidated.
+    def lookup(self, peripheral, uuids):
+        mac = peripheral.addr
+        handles = self._handles.get(mac)
+        if handles is None:
+            handles = self._discover(peripheral, uuids)
+            self._handles[mac] = handles
+        return handles
+
+    def _discover(self, peripheral, uuids):
+        characteristics = peripheral.getCharacteristics()
+        found = {}
+        for n, characteristic in enumerate(characteristics):
+            print("Characteristic - id: %s\tname (if exists): %s\tavailable methods: %s" % (str(characteristic.uuid), str(characteristic), characteristic.propertiesToString()))
+            #The descriptors of a characteristic sit between its value and the next declaration
+            end = characteristics[n + 1].handle - 1 if n + 1 < len(characteristics) else 0xFFFF
+            if characteristic.uuid == SERVICE_CHANGED_UUID:
+                self._subscribe_service_changed(peripheral, characteristic, end)
+            elif characteristic.uuid in uuids and characteristic.uuid not in found:
+                cccd = None
+                if characteristic.properties & NOTIFY_PROPERTY:
+                    cccd = self._cccd(characteristic, end)
+                if cccd is not None or characteristic.supportsRead():
+                    found[characteristic.uuid] = (characteristic.getHandle(), cccd)
+        return [(i,) + found[uuid] for i, uuid in enumerate(uuids) if uuid in found]
+
+    def _cccd(self, characteristic, end):
+        if end <= characteristic.getHandle():
+            return None
+        for descriptor in characteristic.getDescriptors(forUUID=CCCD_UUID, hndEnd=end):
+            return descriptor.handle
+        return None
+
+    def _subscribe_service_changed(self, peripheral, characteristic, end):
+        cccd = self._cccd(characteristic, end)
+        if cccd is None:
+            return
+        self._service_changed[peripheral.addr] = characteristic.getHandle()
+        if not isinstance(peripheral.delegate, ServiceChangedDelegate):
+            peripheral.withDelegate(ServiceChangedDelegate(self, peripheral.addr))
+        peripheral.writeCharacteristic(cccd, CCCD_INDICATE, withResponse=True)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import queue, threading, time
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.rest import ApiException
+
+_STOP = object()
+_FLUSH = object()
+#Client errors that are about the request rather than the batch, so are retried:
+#bad credentials or permissions, a missing bucket and rate limiting
+_RETRIED = (401, 403, 404, 429)
+
+
+#Long-lived InfluxDB writer. Points are serialized to line protocol by the caller,
+#buffered in a bounded queue and written in batches from a background thread,
+#whenever batch_size lines are pending or flush_interval seconds have passed.
+#write() blocks while the queue is full, so a slow database slows the producers
+#down instead of growing memory without bound.
+#With a spool, batches that cannot be written are kept on disk and replayed in
+#bulk, retrying every retry_interval seconds until the database is back.
+class InfluxWriter:
+    def __init__(self, url, token, org, bucket, batch_size=500, flush_interval=1.0, max_pending=10000, spool=None, retry_interval=10.0):
+        self.org = org
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self.retry_interval = retry_interval
+        self._retry_at = 0
+        #Points lost because neither the database nor the spool took them
+        self.dropped = 0
+        self.client = InfluxDBClient(url=url, token=token, org=org)
+        self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+        self.queue = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def write(self, point):
+        self.queue.put(point.to_line_protocol())
+
+    #Asks the background thread to write out whatever is buffered right away
+    def flush(self):
+        self.queue.put(_FLUSH)
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.client.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_traceback):
+        self.close()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                line = self.queue.get(timeout=self._timeout(batch, deadline))
+            except queue.Empty:
+                line = _FLUSH
+            if line is not _STOP and line is not _FLUSH:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(line)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            if self._spooled() and time.monotonic() >= self._retry_at:
+                self._replay()
+            if line is _STOP:
+                if self.spool is not None:
+                    try:
+                        self.spool.close()
+                    except Exception as e:
+                        print("Closing the spool failed: %s" % e)
+                return
+
+    def _timeout(self, batch, deadline):
+        deadlines = []
+        if batch:
+            deadlines.append(deadline)
+        if self._spooled():
+            deadlines.append(self._retry_at)
+        return max(0, min(deadlines) - time.monotonic()) if deadlines else None
+
+    def _spooled(self):
+        return self.spool is not None and self.spool.pending()
+
+    def _post(self, data):
+        try:
+            self.write_api.write(self.bucket, self.org, data, write_precision=WritePrecision.NS)
+        except ApiException as e:
+            #A batch refused for its content (malformed, too large, a field type conflict)
+            #will never be accepted, retrying it would block everything behind it
+            if e.status is None or not 400 <= e.status < 500 or e.status in _RETRIED:
+                raise
+            print("InfluxDB rejected a batch: %s" % e)
+
+    def _write_batch(self, batch):
+        if self._spooled():
+            #Keep the backlog ahead of newer readings, it is replayed in one go
+            self._spool(batch)
+            return
+        try:
+            self._post("\n".join(batch))
+        except Exception as e:
+            if self.spool is None:
+                print("InfluxDB write of %d points failed: %s" % (len(batch), e))
+                return
+            print("InfluxDB write of %d points failed, spooling them: %s" % (len(batch), e))
+            self._spool(batch)
+            self._retry_at = time.monotonic() + self.retry_interval
+
+    #A full or unwritable disk must not end the thread, producers would then block
+    #forever on the full queue, so the batch is dropped instead
+    def _spool(self, batch):
+        try:
+            self.spool.append(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print("Spooling %d points failed, dropping them: %s" % (len(batch), e))
+
+    def _replay(self):
+        try:
+            self.spool.drain(self._post)
+        except Exception as e:
+            print("InfluxDB still unreachable, keeping the spool: %s" % e)
+            self._retry_at = time.monotonic() + self.retry_interval
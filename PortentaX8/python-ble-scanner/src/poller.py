@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import threading, time
+from bluepy.btle import BTLEException
+from connection import Backoff, ConnectionHealth
+
+#Longest stretch spent in waitForNotifications before checking for a stop request
+NOTIFY_WAIT = 1.0
+
+
+#A peripheral to poll, the characteristics to read from it, the decoder of each
+#characteristic keyed by UUID, how often to poll it and the tags of its readings
+class PolledDevice:
+    def __init__(self, name, mac, labels, uuids, decoders, period, tags=None):
+        self.name = name
+        self.mac = mac
+        self.labels = labels
+        self.uuids = uuids
+        self.decoders = decoders
+        self.period = period
+        self.tags = tags or {}
+
+
+#Drives one peripheral on its own thread at its own sampling period.
+#connect(device) returns a Peripheral, read(peripheral, device) returns the readings
+#and sink(device, readings) receives them, so any Peripheral stand-in can be used.
+#Between polls the thread waits in waitForNotifications, so values pushed by the
+#device reach the Peripheral's delegate as soon as they arrive.
+#When the link fails with one of link_errors the peripheral is dropped and
+#connected again after a backoff delay, without affecting the other devices.
+class DevicePoller(threading.Thread):
+    def __init__(self, device, connect, read, sink, stop_event, backoff, link_errors):
+        threading.Thread.__init__(self, name=device.name, daemon=True)
+        self.device = device
+        self.connect = connect
+        self.read = read
+        self.sink = sink
+        self.stop_event = stop_event
+        self.backoff = backoff
+        self.link_errors = link_errors
+        self.health = ConnectionHealth()
+        self.error = None
+        #Failed connections since the last successful poll
+        self.attempt = 0
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            peripheral = None
+            try:
+                peripheral = self.connect(self.device)
+                self.health.connected()
+                self._poll(peripheral)
+            except self.link_errors as e:
+                self.health.disconnected()
+                delay = self.backoff.delay(self.attempt)
+                self.attempt += 1
+                print("%s: link lost (%s), reconnecting in %.1fs" % (self.device.name, e, delay))
+                self.stop_event.wait(delay)
+            finally:
+                if peripheral is not None:
+                    self._disconnect(peripheral)
+
+    def _disconnect(self, peripheral):
+        try:
+            peripheral.disconnect()
+        except Exception:
+            pass
+
+    def _poll(self, peripheral):
+        next_poll = time.monotonic()
+        while not self.stop_event.is_set():
+            readings = self.read(peripheral, self.device)
+            #Only a link that got through a poll starts the backoff over, one that
+            #fails during discovery or the first read keeps backing off
+            self.attempt = 0
+            if readings:
+                self.sink(self.device, readings)
+            next_poll += self.device.period
+            delay = next_poll - time.monotonic()
+            if delay < 0:
+                #Overran the period, start counting again from now instead of bursting
+                next_poll = time.monotonic()
+                delay = 0
+            self._wait(peripheral, delay)
+
+    def _wait(self, peripheral, delay):
+        deadline = time.monotonic() + delay
+        while not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            peripheral.waitForNotifications(min(remaining, NOTIFY_WAIT))
+
+
+#Polls any number of devices concurrently, so a cycle takes as long as the
+#slowest device instead of the sum of all of them
+class Poller:
+    def __init__(self, devices, connect, read, sink, backoff=None, link_errors=(BTLEException,)):
+        self.stop_event = threading.Event()
+        backoff = backoff or Backoff()
+        self.pollers = [DevicePoller(device, connect, read, sink, self.stop_event, backoff, link_errors) for device in devices]
+
+    def start(self):
+        for poller in self.pollers:
+            poller.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for poller in self.pollers:
+            poller.join()
+
+    #Connection health of every device, keyed by device name
+    def health(self):
+        return dict((poller.device.name, poller.health) for poller in self.pollers)
+
+    #Blocks until stopped, calling report(health) every report_interval seconds
+    #and re-raising the first unexpected error of a device thread
+    def run_forever(self, report=None, report_interval=60):
+        self.start()
+        while not self.stop_event.wait(report_interval if report else None):
+            report(self.health())
+        self.stop()
+        for poller in self.pollers:
+            if poller.error is not None:
+                raise poller.error
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os, time
+
+SEGMENT_SUFFIX = ".lp"
+
+
+#Write-ahead spool of line protocol batches that could not be written to InfluxDB.
+#Batches are appended to numbered segment files, fsynced at most once every
+#fsync_interval seconds and rotated once a segment reaches segment_bytes.
+#Segments are replayed oldest first and deleted once fully written.
+class Spool:
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, fsync_interval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        segments = self.segments()
+        #Never append to a segment left by a previous run, it may end in a torn write
+        self._next = int(os.path.basename(segments[-1])[:-len(SEGMENT_SUFFIX)]) + 1 if segments else 0
+        self._backlog = len(segments) > 0
+        self._file = None
+        self._size = 0
+        self._last_sync = 0
+
+    def segments(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def pending(self):
+        return self._backlog or self._file is not None
+
+    def append(self, lines):
+        if self._file is None:
+            path = os.path.join(self.directory, "%020d%s" % (self._next, SEGMENT_SUFFIX))
+            self._file = open(path, "ab")
+            self._next += 1
+            self._size = 0
+        data = ("\n".join(lines) + "\n").encode()
+        try:
+            self._file.write(data)
+            self._size += len(data)
+            if self._size >= self.segment_bytes:
+                self.close()
+            elif time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+        except OSError:
+            self._abandon()
+            raise
+
+    def close(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+            self._backlog = True
+
+    #Gives up on a segment that failed to write, the next batch starts a new one so
+    #a torn line can only be at the end of this one, where drain skips it
+    def _abandon(self):
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        self._backlog = True
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    #Hands the spooled lines to write(data) in chunks of up to chunk_bytes, cut on
+    #line boundaries. An exception from write stops the replay and keeps the
+    #current segment, so its chunks are sent again on the next replay; InfluxDB
+    #overwrites points with the same series and timestamp, so that is harmless.
+    def drain(self, write, chunk_bytes=4 * 1024 * 1024):
+        self.close()
+        for path in self.segments():
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(chunk_bytes)
+                    end = data.rfind(b"\n") + 1
+                    if end == 0:
+                        #Empty, or an unterminated line from a torn write
+                        break
+                    f.seek(end - len(data), os.SEEK_CUR)
+                    write(data[:end])
+            os.remove(path)
+        self._backlog = False